@@ -0,0 +1,784 @@
+import networkx as nx
+import numpy as np
+import heapq
+import math
+
+# Compute the rewards of calc_node_profit and compute_node_rew per biconnected block, see reroute_edge_betweenness
+block_decomposition = True
+
+
+"""Function that converts a graph into a plain adjacency dictionary, which is much faster to iterate over than the 
+networkx views.
+
+:param graph: The graph object.
+:returns: Dictionary mapping every node to a list of (successor, weight) tuples.
+"""
+def weighted_adjacency(graph):
+    return {node: [(succ, edge_data['weight']) for succ, edge_data in nbrs.items()]
+            for node, nbrs in graph.adjacency()}
+
+
+"""Function that checks whether every fee of a graph is a positive integer. Only then are path lengths exact, whatever 
+the order of the additions, so shortest paths can be recognized by comparing sums of distances (as reroute_node_reward 
+does) and no two nodes are at distance 0 of each other.
+
+:param graph: The graph object.
+:returns: Boolean whether all fees are positive integers.
+"""
+def has_positive_integer_fees(graph):
+    return all(data['weight'] > 0 and float(data['weight']).is_integer() for _, _, data in graph.edges(data=True))
+
+
+"""Function that checks whether a graph has an edge with fee 0. The Brandes dependencies of networkx count the equal 
+length paths over such edges differently than nx.all_shortest_paths, so the rewards without the own transactions 
+(fee_strategies.remove_own_betweenness_score) can then only be computed from the enumerated paths.
+
+:param graph: The graph object.
+:returns: Boolean whether any fee is 0.
+"""
+def has_zero_fee(graph):
+    return any(data['weight'] == 0 for _, _, data in graph.edges(data=True))
+
+
+"""Function that converts a graph into the adjacency dictionary of grouped_dijkstra_path_basic, which needs fees that 
+are not negative.
+
+:param graph: The graph object.
+:returns: Dictionary mapping every node to a list of (successor, weight) tuples, or None when a fee is negative.
+"""
+def grouped_adjacency(graph):
+    adjacency = {}
+    for node, nbrs in graph.adjacency():
+        edges = []
+        for succ, edge_data in nbrs.items():
+            weight = edge_data['weight']
+            if weight < 0:
+                return None
+            edges.append((succ, weight))
+        adjacency[node] = edges
+    return adjacency
+
+
+"""Function that performs the single source step of networkx' Brandes implementation, a copy of the private 
+networkx function _single_source_dijkstra_path_basic. It is kept here so the results stay exactly equal to 
+nx.edge_betweenness_centrality without depending on a private function that can change in any release: nodes are 
+settled in order of (distance, push counter) and equal paths are counted in the order they are found.
+
+:param graph: The graph object.
+:param src_node: The source.
+:returns: The nodes in the order they were settled, dictionary with the predecessors of every node on its shortest 
+paths, dictionary with the number of shortest paths to every node and dictionary with the distances from the source.
+"""
+def dijkstra_path_basic(graph, src_node):
+    stack = []
+    preds = {node: [] for node in graph}
+    sigma = dict.fromkeys(graph, 0.0)
+    dist = {}
+    sigma[src_node] = 1.0
+    seen = {src_node: 0}
+    queue = [(0, 0, src_node, src_node)]
+    counter = 1
+    while queue:
+        node_dist, _, pred, node = heapq.heappop(queue)
+        if node in dist:
+            continue
+        sigma[node] += sigma[pred]
+        stack.append(node)
+        dist[node] = node_dist
+        for succ, edge_data in graph[node].items():
+            succ_dist = node_dist + edge_data['weight']
+            if succ not in dist and (succ not in seen or succ_dist < seen[succ]):
+                seen[succ] = succ_dist
+                heapq.heappush(queue, (succ_dist, counter, node, succ))
+                counter += 1
+                sigma[succ] = 0.0
+                preds[succ] = [node]
+            elif succ_dist == seen[succ]:
+                sigma[succ] += sigma[node]
+                preds[succ].append(node)
+    return stack, preds, sigma, dist
+
+
+"""Function that performs the single source step of networkx' Brandes implementation (dijkstra_path_basic) with the 
+pushes grouped by distance. Every distance gets a list of the nodes pushed with it, in the order they were pushed, and 
+only the distinct distances are kept in a heap instead of a (distance, counter) tuple for every push. The distances are 
+the same sums networkx compares, so nodes are settled in the same order and the results are exactly equal for any 
+fees that are not negative, integer or not. The worst case is the same as for the binary heap, but a heap operation is 
+only needed for every new distance, which saves most of them when many paths have equal lengths.
+
+:param adjacency: The adjacency dictionary of the graph, see grouped_adjacency.
+:param src_node: The source.
+:returns: The nodes in the order they were settled, dictionary with the predecessors of every node on its shortest 
+paths, dictionary with the number of shortest paths to every node and dictionary with the distances from the source.
+"""
+def grouped_dijkstra_path_basic(adjacency, src_node):
+    stack = []
+    preds = {node: [] for node in adjacency}
+    sigma = dict.fromkeys(adjacency, 0.0)
+    dist = {}
+    sigma[src_node] = 1.0
+    seen = {src_node: 0}
+    groups = {0: [(src_node, src_node)]}
+    keys = [0]
+
+    while keys:
+        key = heapq.heappop(keys)
+        group = groups[key]
+        # Edges with fee 0 add to the group that is being processed
+        index = 0
+        while index < len(group):
+            pred, node = group[index]
+            index += 1
+            if node in dist:
+                continue
+            sigma[node] += sigma[pred]
+            stack.append(node)
+            dist[node] = key
+            for succ, weight in adjacency[node]:
+                succ_dist = key + weight
+                if succ not in dist and (succ not in seen or succ_dist < seen[succ]):
+                    seen[succ] = succ_dist
+                    if succ_dist in groups:
+                        groups[succ_dist].append((node, succ))
+                    else:
+                        groups[succ_dist] = [(node, succ)]
+                        heapq.heappush(keys, succ_dist)
+                    sigma[succ] = 0.0
+                    preds[succ] = [node]
+                elif succ_dist == seen[succ]:
+                    sigma[succ] += sigma[node]
+                    preds[succ].append(node)
+        del groups[key]
+    return stack, preds, sigma, dist
+
+
+"""Function that draws one uniformly random shortest path between two nodes. Dijkstra is run from the source until
+the target is settled, while counting the number of shortest paths to every node. The path is then drawn backwards
+from the target, picking every predecessor with a probability proportional to its number of shortest paths.
+
+:param adjacency: The adjacency dictionary of the graph, see weighted_adjacency.
+:param src_node: The source of the path.
+:param dest_node: The destination of the path.
+:param rng: The numpy random Generator used to draw the path.
+:returns: The list of nodes on the path, or None if the destination can not be reached.
+"""
+def sample_shortest_path(adjacency, src_node, dest_node, rng):
+    sigma = {src_node: 1.0}
+    preds = {src_node: []}
+    seen = {src_node: 0}
+    settled = set()
+    queue = [(0, 0, src_node)]
+    counter = 1
+
+    while len(queue) > 0:
+        dist, _, node = heapq.heappop(queue)
+        if node in settled:
+            continue
+        settled.add(node)
+        if node == dest_node:
+            break
+        for succ, weight in adjacency[node]:
+            succ_dist = dist + weight
+            if succ not in settled and (succ not in seen or succ_dist < seen[succ]):
+                seen[succ] = succ_dist
+                sigma[succ] = sigma[node]
+                preds[succ] = [node]
+                heapq.heappush(queue, (succ_dist, counter, succ))
+                counter += 1
+            elif succ_dist == seen[succ]:
+                sigma[succ] += sigma[node]
+                preds[succ].append(node)
+
+    if dest_node not in settled:
+        return None
+
+    path = [dest_node]
+    while path[-1] != src_node:
+        options = preds[path[-1]]
+        pick = rng.random() * sigma[path[-1]]
+        for pred in options:
+            pick -= sigma[pred]
+            if pick < 0:
+                break
+        path.append(pred)
+    path.reverse()
+    return path
+
+
+"""Function that estimates which k candidates have the highest betweenness centrality by sampling shortest paths, in
+the style of KADABRA. Samples are drawn in rounds of increasing size. After every round a confidence interval is
+computed for every node (empirical Bernstein bound with a union bound over the nodes and rounds), and sampling stops
+as soon as the interval of every chosen candidate lies above the intervals of all other candidates. If that does not
+happen, sampling stops at the number of samples that guarantees every estimate is within epsilon.
+
+:param graph: The graph object.
+:param candidates: The node id's to choose from.
+:param k: The number of candidates to choose.
+:param delta: The allowed probability that the returned guarantee does not hold.
+:param epsilon: The maximal error of the (normalized) estimates when the candidates could not be separated.
+:param seed: The seed used to sample the paths.
+:returns: The chosen candidates sorted by estimated betweenness, the estimates (unnormalized, as
+nx.betweenness_centrality(normalized=False)) and a report on the guarantee that was achieved.
+"""
+def approximate_top_k_betweenness(graph, candidates, k, delta=0.1, epsilon=0.01, seed=None):
+    rng = np.random.default_rng(seed)
+    nodes = list(graph.nodes())
+    node_amt = len(nodes)
+    node_index = {node: index for index, node in enumerate(nodes)}
+    candidate_index = np.array([node_index[node] for node in candidates], dtype=int)
+    pair_amt = node_amt * (node_amt - 1)
+    adjacency = weighted_adjacency(graph)
+
+    # Number of samples after which every estimate is within epsilon (VC-dimension bound, with N as vertex diameter)
+    # Half of delta is used for this bound, the other half for the confidence intervals
+    max_samples = int(math.ceil(0.5 / epsilon ** 2 * (math.floor(math.log2(max(node_amt - 2, 2))) + 1 +
+                                                     math.log(4 / delta))))
+
+    counts = np.zeros(node_amt)
+    samples = 0
+    check = 0
+    next_check = min(100, max_samples)
+    separated = len(candidates) <= k or k <= 0
+    half_width = np.ones(node_amt)
+
+    while not separated and samples < max_samples:
+        while samples < next_check:
+            src_node, dest_node = rng.choice(node_amt, 2, replace=False)
+            path = sample_shortest_path(adjacency, nodes[src_node], nodes[dest_node], rng)
+            samples += 1
+            if path is not None:
+                for node in path[1:-1]:
+                    counts[node_index[node]] += 1
+
+        # Confidence interval of every node, delta is divided over the nodes and the (geometrically spaced) checks
+        check += 1
+        log_term = math.log(6 * node_amt * 2 ** check / delta)
+        mean = counts / samples
+        half_width = np.sqrt(2 * mean * (1 - mean) * log_term / samples) + 3 * log_term / samples
+
+        candidate_mean = mean[candidate_index]
+        order = np.argsort(-candidate_mean, kind='stable')
+        top = order[0:k]
+        rest = order[k:]
+        lower = np.min(candidate_mean[top] - half_width[candidate_index[top]])
+        upper = np.max(candidate_mean[rest] + half_width[candidate_index[rest]])
+        separated = lower > upper
+
+        next_check = min(2 * next_check, max_samples)
+
+    mean = counts / max(samples, 1)
+    estimates = {node: mean[node_index[node]] * pair_amt for node in nodes}
+    chosen = sorted(candidates, key=lambda node: estimates[node], reverse=True)[0:k]
+
+    report = {"samples": samples, "max_samples": max_samples, "separated": bool(separated),
+              "confidence": 1 - delta if separated or samples >= max_samples else 0.0,
+              "epsilon": None if separated else min(epsilon, float(np.max(half_width)))}
+    return chosen, estimates, report
+
+
+"""Function that computes the distance and the number of shortest paths between all pairs of nodes, with one Dijkstra
+per source. Paths of equal length are counted when their lengths are exactly equal, like networkx does.
+
+:param graph: The graph object.
+:param nodes: The order of the nodes in the matrices.
+:returns: Matrix with the distances (inf when there is no path) and matrix with the number of shortest paths, indexed
+as [source, destination]. The diagonal has distance 0 and one path.
+"""
+def all_pairs_distances_and_counts(graph, nodes):
+    node_index = {node: index for index, node in enumerate(nodes)}
+    adjacency = weighted_adjacency(graph)
+    dist_matrix = np.full((len(nodes), len(nodes)), np.inf)
+    sigma_matrix = np.zeros((len(nodes), len(nodes)))
+
+    for src_node in nodes:
+        sigma = {src_node: 1.0}
+        seen = {src_node: 0}
+        settled = {}
+        queue = [(0, 0, src_node)]
+        counter = 1
+        while len(queue) > 0:
+            dist, _, node = heapq.heappop(queue)
+            if node in settled:
+                continue
+            settled[node] = dist
+            for succ, weight in adjacency[node]:
+                succ_dist = dist + weight
+                if succ not in settled and (succ not in seen or succ_dist < seen[succ]):
+                    seen[succ] = succ_dist
+                    sigma[succ] = sigma[node]
+                    heapq.heappush(queue, (succ_dist, counter, succ))
+                    counter += 1
+                elif succ not in settled and succ_dist == seen[succ]:
+                    sigma[succ] += sigma[node]
+
+        row = node_index[src_node]
+        for node, dist in settled.items():
+            dist_matrix[row, node_index[node]] = dist
+            sigma_matrix[row, node_index[node]] = sigma[node]
+    return dist_matrix, sigma_matrix
+
+
+"""Function that converts the edges of a graph into arrays, sorted by destination, as used by
+batched_distances_and_counts.
+
+:param graph: The graph object.
+:param nodes: The order of the nodes.
+:returns: Arrays with the source index, destination index and weight of every edge.
+"""
+def edge_arrays(graph, nodes):
+    node_index = {node: index for index, node in enumerate(nodes)}
+    edges = sorted((node_index[dst], node_index[src], data['weight']) for src, dst, data in graph.edges(data=True))
+    heads = np.array([edge[0] for edge in edges], dtype=int)
+    tails = np.array([edge[1] for edge in edges], dtype=int)
+    weights = np.array([edge[2] for edge in edges], dtype=float)
+    return tails, heads, weights
+
+
+"""Function that computes the distances and numbers of shortest paths between all pairs of nodes for many weight
+vectors of the same graph at once. Instead of a Dijkstra per source and weight vector, all sources and weight vectors
+are relaxed together with numpy (Bellman-Ford), after which the number of shortest paths is counted over the edges
+that lie on a shortest path. Both loops run once per edge on the longest shortest path (in edges). 
+Weights are compared exactly, so integer weights are recommended.
+
+:param tails: The source index of every edge, see edge_arrays.
+:param heads: The destination index of every edge, sorted.
+:param weights: Matrix with a weight vector per row, with a weight for every edge.
+:param node_amt: The number of nodes.
+:returns: Arrays with the distances (inf when there is no path) and the numbers of shortest paths, indexed as 
+[weight vector, source, destination].
+"""
+def batched_distances_and_counts(tails, heads, weights, node_amt):
+    sample_amt = weights.shape[0]
+    diagonal = np.arange(node_amt)
+    group_starts = np.flatnonzero(np.r_[True, heads[1:] != heads[:-1]]) if len(heads) > 0 else np.array([], dtype=int)
+    group_heads = heads[group_starts]
+
+    dist = np.full((sample_amt, node_amt, node_amt), np.inf)
+    dist[:, diagonal, diagonal] = 0
+    while len(heads) > 0:
+        best = np.minimum.reduceat(dist[:, :, tails] + weights[:, None, :], group_starts, axis=2)
+        improved = np.minimum(dist[:, :, group_heads], best)
+        if np.array_equal(improved, dist[:, :, group_heads]):
+            break
+        dist[:, :, group_heads] = improved
+
+    sigma = np.zeros((sample_amt, node_amt, node_amt))
+    sigma[:, diagonal, diagonal] = 1
+    if len(heads) > 0:
+        tight = (dist[:, :, tails] + weights[:, None, :] == dist[:, :, heads]) & np.isfinite(dist[:, :, heads])
+        while True:
+            counted = np.add.reduceat(np.where(tight, sigma[:, :, tails], 0), group_starts, axis=2)
+            counted[:, diagonal[:, None] == group_heads[None, :]] = 1
+            if np.array_equal(counted, sigma[:, :, group_heads]):
+                break
+            sigma[:, :, group_heads] = counted
+    return dist, sigma
+
+
+"""Function that computes the reward of every edge of a node from the transactions it reroutes, as calc_node_profit 
+does, using the distance and path count matrices of the graph. The pairs that use an edge (node, succ) follow from 
+combining the shortest paths towards the node (a column of the matrices) with the shortest paths from succ (a row of the 
+matrices), so only the edges of the node are evaluated. Paths are recognized by comparing sums of distances, so the 
+graph needs positive integer fees, see has_positive_integer_fees.
+
+:param graph: The graph object.
+:param node: The node ID.
+:param dist_matrix: The distance matrix, see all_pairs_distances_and_counts.
+:param sigma_matrix: The matrix with the number of shortest paths, see all_pairs_distances_and_counts.
+:param node_index: Dictionary mapping the node ID's to their index in the matrices.
+:returns: Dictionary mapping every successor of the node to the reward of the edge towards it.
+"""
+def reroute_edge_rewards(graph, node, dist_matrix, sigma_matrix, node_index):
+    index = node_index[node]
+    to_node = dist_matrix[:, index]
+    paths_to_node = sigma_matrix[:, index].copy()
+    # Transactions sent by the node itself are not rerouted
+    paths_to_node[index] = 0.0
+    connected = np.isfinite(dist_matrix)
+    np.fill_diagonal(connected, False)
+
+    rewards = {}
+    for _, succ, data in graph.out_edges(node, data=True):
+        weight = data['weight']
+        from_succ = node_index[succ]
+        through = connected & (to_node[:, None] + weight + dist_matrix[from_succ][None, :] == dist_matrix)
+        sources, destinations = np.nonzero(through)
+        usage = float(np.sum(paths_to_node[sources] * sigma_matrix[from_succ, destinations]
+                             / sigma_matrix[sources, destinations]))
+        rewards[succ] = usage * weight if np.abs(usage) >= 0.0001 else 0.0
+    return rewards
+
+
+"""Function that computes the reward of a node from the transactions it reroutes, as calc_node_profit does, using the 
+distance and path count matrices of the graph, see reroute_edge_rewards.
+
+:param graph: The graph object.
+:param node: The node ID.
+:param dist_matrix: The distance matrix, see all_pairs_distances_and_counts.
+:param sigma_matrix: The matrix with the number of shortest paths, see all_pairs_distances_and_counts.
+:param node_index: Dictionary mapping the node ID's to their index in the matrices.
+:returns: The reward of the node.
+"""
+def reroute_node_reward(graph, node, dist_matrix, sigma_matrix, node_index):
+    reward = 0.0
+    for edge_reward in reroute_edge_rewards(graph, node, dist_matrix, sigma_matrix, node_index).values():
+        reward += edge_reward
+    return reward
+
+"""Function that computes the contribution of a single source to the edge and node betweenness (its Brandes 
+dependencies), with the same operations as networkx. Adding the contributions of all sources in node order gives 
+exactly nx.edge_betweenness_centrality and nx.betweenness_centrality (normalized=False).
+
+:param graph: The graph object.
+:param src_node: The source.
+:param adjacency: Optional adjacency dictionary of the graph (see grouped_adjacency), when given the shortest paths 
+are found with grouped_dijkstra_path_basic.
+:returns: Dictionary with the dependency of every edge on a shortest path from the source, dictionary with the 
+dependency of every node reached from the source and dictionary with the distances from the source.
+"""
+def source_dependencies(graph, src_node, adjacency=None):
+    if adjacency is not None:
+        stack, preds, sigma, dist = grouped_dijkstra_path_basic(adjacency, src_node)
+    else:
+        stack, preds, sigma, dist = dijkstra_path_basic(graph, src_node)
+    edge_dependency = {}
+    node_dependency = {}
+
+    delta = dict.fromkeys(stack, 0)
+    while stack:
+        node = stack.pop()
+        coeff = (1 + delta[node]) / sigma[node]
+        for pred in preds[node]:
+            contribution = sigma[pred] * coeff
+            edge_dependency[(pred, node)] = contribution
+            delta[pred] += contribution
+        if node != src_node:
+            node_dependency[node] = delta[node]
+    return edge_dependency, node_dependency, dist
+
+"""Function that computes the edge betweenness, equal to nx.edge_betweenness_centrality(normalized=False), and during 
+the same pass the reward every source pays to every node for rerouting its transactions. The reward of an edge 
+(owner, succ) is its dependency on the source times its fee, transactions of the owner itself are not counted.
+
+:param graph: The graph object.
+:returns: Dictionary mapping every edge to its betweenness, and the attribution as three arrays of equal length 
+(sparse matrix in coordinate format): the sources, the owners and the amounts the sources pay the owners.
+"""
+def edge_betweenness_with_attribution(graph):
+    between_cent = dict.fromkeys(graph.edges(), 0.0)
+    sources = []
+    owners = []
+    amounts = []
+    adjacency = grouped_adjacency(graph)
+    for src_node in graph.nodes():
+        edge_dependency, _, _ = source_dependencies(graph, src_node, adjacency)
+        owner_amounts = {}
+        for edge, dependency in edge_dependency.items():
+            between_cent[edge] += dependency
+            if edge[0] != src_node:
+                fee = graph[edge[0]][edge[1]]['weight']
+                owner_amounts[edge[0]] = owner_amounts.get(edge[0], 0.0) + dependency * fee
+        for owner, amount in owner_amounts.items():
+            sources.append(src_node)
+            owners.append(owner)
+            amounts.append(amount)
+    return between_cent, (np.array(sources, dtype=str), np.array(owners, dtype=str), np.array(amounts, dtype=float))
+
+"""Class that keeps the (unnormalized) edge and node betweenness centrality of a graph up to date while the graph 
+changes. The contribution of every source (its Brandes dependencies) is stored separately. When edges are added, 
+removed or change weight, only the sources whose shortest paths can change are recomputed: the sources for which a 
+removed edge or the old weight of an edge lay on a shortest path, and the sources for which an added edge or the new 
+weight of an edge gives a path that is at most as long as the current one. The totals are summed over the sources in 
+node order, which gives exactly the values of nx.edge_betweenness_centrality and nx.betweenness_centrality.
+
+:param graph: The graph object.
+"""
+class IncrementalBetweenness:
+
+    def __init__(self, graph):
+        self.rebuild(graph)
+
+    """Function that computes the contributions of all sources from scratch.
+
+    :param graph: The graph object.
+    :returns: Void.
+    """
+    def rebuild(self, graph):
+        self.sources = list(graph.nodes())
+        self.source_index = {node: index for index, node in enumerate(self.sources)}
+        self.weights = {(src, dst): data['weight'] for src, dst, data in graph.edges(data=True)}
+        self.edge_index = {edge: index for index, edge in enumerate(self.weights)}
+        self.edge_contrib = np.zeros((len(self.sources), len(self.edge_index)))
+        self.node_contrib = np.zeros((len(self.sources), len(self.sources)))
+        self.dist = {}
+        adjacency = grouped_adjacency(graph)
+        for src_node in self.sources:
+            self.compute_source(graph, src_node, adjacency)
+        self.report = {"updates": 0, "recomputed_sources": len(self.sources)}
+
+    """Function that computes the contribution of a single source, as in networkx' Brandes implementation.
+
+    :param graph: The graph object.
+    :param src_node: The source.
+    :param adjacency: Optional adjacency dictionary of the graph, see source_dependencies.
+    :returns: Void.
+    """
+    def compute_source(self, graph, src_node, adjacency=None):
+        edge_dependency, node_dependency, self.dist[src_node] = source_dependencies(graph, src_node, adjacency)
+        edge_row = self.edge_contrib[self.source_index[src_node]]
+        node_row = self.node_contrib[self.source_index[src_node]]
+        edge_row[:] = 0.0
+        node_row[:] = 0.0
+        for edge, dependency in edge_dependency.items():
+            edge_row[self.edge_index[edge]] = dependency
+        for node, dependency in node_dependency.items():
+            node_row[self.source_index[node]] = dependency
+
+    """Function that checks if the shortest paths of a source can be changed by a list of edge changes.
+
+    :param src_node: The source.
+    :param changes: List of (source, destination, old weight, new weight) tuples, None for a missing edge.
+    :returns: A boolean indicating whether the source needs to be recomputed.
+    """
+    def is_affected(self, src_node, changes):
+        dist = self.dist[src_node]
+        for node1, node2, old_weight, new_weight in changes:
+            if node1 not in dist:
+                continue
+            if old_weight is not None and node2 in dist and dist[node1] + old_weight == dist[node2]:
+                return True
+            if new_weight is not None and (node2 not in dist or dist[node1] + new_weight <= dist[node2]):
+                return True
+        return False
+
+    """Function that brings the betweenness up to date with the graph, recomputing only the affected sources.
+
+    :param graph: The graph object, changed since the last update.
+    :returns: The number of sources that were recomputed.
+    """
+    def update(self, graph):
+        if any(node not in graph for node in self.sources):
+            self.rebuild(graph)
+            return len(self.sources)
+
+        weights = {(src, dst): data['weight'] for src, dst, data in graph.edges(data=True)}
+        changes = []
+        for edge, weight in self.weights.items():
+            if edge not in weights:
+                changes.append((edge[0], edge[1], weight, None))
+            elif weights[edge] != weight:
+                changes.append((edge[0], edge[1], weight, weights[edge]))
+        for edge, weight in weights.items():
+            if edge not in self.weights:
+                changes.append((edge[0], edge[1], None, weight))
+                if edge not in self.edge_index:
+                    self.edge_index[edge] = len(self.edge_index)
+
+        affected = [src_node for src_node in self.sources if self.is_affected(src_node, changes)]
+
+        # New nodes are added as sources at the end, just like they are at the end of the node order of the graph
+        new_nodes = [node for node in graph.nodes() if node not in self.source_index]
+        for node in new_nodes:
+            self.source_index[node] = len(self.sources)
+            self.sources.append(node)
+        node_amt = len(self.sources)
+        self.edge_contrib = np.pad(self.edge_contrib, ((0, node_amt - self.edge_contrib.shape[0]),
+                                                       (0, len(self.edge_index) - self.edge_contrib.shape[1])))
+        self.node_contrib = np.pad(self.node_contrib, ((0, node_amt - self.node_contrib.shape[0]),
+                                                       (0, node_amt - self.node_contrib.shape[1])))
+
+        self.weights = weights
+        adjacency = grouped_adjacency(graph)
+        for src_node in affected + new_nodes:
+            self.compute_source(graph, src_node, adjacency)
+        self.report["updates"] += 1
+        self.report["recomputed_sources"] += len(affected) + len(new_nodes)
+        return len(affected) + len(new_nodes)
+
+    """Function that returns the edge betweenness, equal to nx.edge_betweenness_centrality(normalized=False).
+
+    :returns: Dictionary mapping every edge to its betweenness.
+    """
+    def edge_betweenness(self):
+        # Reducing over the first axis adds the sources one after the other, in the same order as networkx
+        totals = np.add.reduce(self.edge_contrib, axis=0)
+        return {edge: float(totals[self.edge_index[edge]]) for edge in self.weights}
+
+    """Function that returns the edge betweenness without the paths that start at the source of the edge, equal to 
+    applying fee_strategies.remove_own_betweenness_score for every node.
+
+    :returns: Dictionary mapping every edge to its betweenness.
+    """
+    def reroute_edge_betweenness(self):
+        totals = np.add.reduce(self.edge_contrib, axis=0)
+        between_cent = {}
+        for edge in self.weights:
+            index = self.edge_index[edge]
+            value = totals[index] - self.edge_contrib[self.source_index[edge[0]], index]
+            between_cent[edge] = 0.0 if np.abs(value) < 0.0001 else float(value)
+        return between_cent
+
+    """Function that returns the node betweenness, equal to nx.betweenness_centrality(normalized=False).
+
+    :returns: Dictionary mapping every node to its betweenness.
+    """
+    def node_betweenness(self):
+        totals = np.add.reduce(self.node_contrib, axis=0)
+        return {node: float(totals[index]) for node, index in self.source_index.items()}
+
+
+"""Function that splits a graph into its biconnected blocks, of the undirected graph. Blocks share at most one node, an 
+articulation point, and a shortest path only leaves a block through an articulation point it never returns to. Every 
+node of a block therefore represents the nodes that hang off the block behind it: a node that is not an articulation 
+point represents only itself, an articulation point represents itself and everything on its side of the block-cut 
+tree. Pendant trees, such as channels to leaf nodes, are chains of two node blocks, so their traffic ends up as the 
+multiplicity of the node they hang off in the core.
+
+:param graph: The graph object, it needs to be strongly connected.
+:returns: List with the nodes of every block, and list with a dictionary per block mapping its nodes to the number of 
+nodes they represent.
+"""
+def block_multiplicities(graph):
+    undirected = graph.to_undirected(as_view=True)
+    blocks = [set(block) for block in nx.biconnected_components(undirected)]
+    cut_nodes = set(nx.articulation_points(undirected))
+
+    block_cut_tree = nx.Graph()
+    tree_sizes = {}
+    for index, block in enumerate(blocks):
+        block_cut_tree.add_node(("block", index))
+        tree_sizes[("block", index)] = len(block - cut_nodes)
+        for node in block & cut_nodes:
+            block_cut_tree.add_edge(("block", index), ("cut", node))
+            tree_sizes[("cut", node)] = 1
+
+    # Number of nodes in the subtree of every node of the block-cut tree, rooted at the first block
+    root = ("block", 0)
+    parents = nx.dfs_predecessors(block_cut_tree, root)
+    subtree_sizes = {}
+    for tree_node in nx.dfs_postorder_nodes(block_cut_tree, root):
+        subtree_sizes[tree_node] = tree_sizes[tree_node] + sum(subtree_sizes[child] for child in
+                                                               block_cut_tree[tree_node] if child != parents.get(tree_node))
+
+    node_amt = len(graph.nodes())
+    multiplicities = []
+    for index, block in enumerate(blocks):
+        multiplicity = dict.fromkeys(block, 1)
+        for node in block & cut_nodes:
+            if parents[("cut", node)] == ("block", index):
+                multiplicity[node] = subtree_sizes[("cut", node)]
+            else:
+                multiplicity[node] = node_amt - subtree_sizes[("block", index)]
+        multiplicities.append(multiplicity)
+    return blocks, multiplicities
+
+
+"""Function that computes the contribution of a single source of a block to the betweenness of the block, see 
+block_dependencies.
+
+:param block_graph: The graph of the block.
+:param multiplicity: Dictionary mapping the nodes of the block to the number of nodes they represent.
+:param src_node: The source.
+:param adjacency: Optional adjacency dictionary of the block (see grouped_adjacency), when given the shortest paths 
+are found with grouped_dijkstra_path_basic.
+:returns: Dictionary with the contribution to every edge on a shortest path from the source, and dictionary with the 
+dependency of the edges leaving the source on the source itself.
+"""
+def block_source_dependencies(block_graph, multiplicity, src_node, adjacency=None):
+    if adjacency is not None:
+        stack, preds, sigma, _ = grouped_dijkstra_path_basic(adjacency, src_node)
+    else:
+        stack, preds, sigma, _ = dijkstra_path_basic(block_graph, src_node)
+    edge_dependency = {}
+    own_dependency = {}
+    delta = dict.fromkeys(stack, 0)
+    while stack:
+        node = stack.pop()
+        destinations = multiplicity[node] if node != src_node else 0
+        coeff = (destinations + delta[node]) / sigma[node]
+        for pred in preds[node]:
+            contribution = sigma[pred] * coeff
+            edge_dependency[(pred, node)] = multiplicity[src_node] * contribution
+            if pred == src_node:
+                own_dependency[(pred, node)] = contribution
+            delta[pred] += contribution
+    return edge_dependency, own_dependency
+
+
+"""Function that runs Brandes on a single block, where every node stands for the number of sources and destinations 
+given by its multiplicity.
+
+:param block_graph: The graph of the block.
+:param multiplicity: Dictionary mapping the nodes of the block to the number of nodes they represent.
+:param tails: The nodes of which the edges need to be computed, None for every edge.
+:returns: Dictionary with the betweenness of the edges and dictionary with the dependency of the edges on their own 
+source, the transactions sent by the node at the tail of the edge.
+"""
+def block_dependencies(block_graph, multiplicity, tails):
+    between_cent = {edge: 0.0 for edge in block_graph.edges() if tails is None or edge[0] in tails}
+    own_dependency = {}
+    adjacency = grouped_adjacency(block_graph)
+    for src_node in block_graph.nodes():
+        edge_dependency, source_own_dependency = block_source_dependencies(block_graph, multiplicity, src_node,
+                                                                           adjacency)
+        for edge, dependency in edge_dependency.items():
+            if edge in between_cent:
+                between_cent[edge] += dependency
+        own_dependency.update(source_own_dependency)
+    return between_cent, own_dependency
+
+
+"""Function that returns the blocks reroute_edge_betweenness computes a graph with: the biconnected blocks (see 
+block_multiplicities) when the graph is strongly connected and has positive integer fees, the whole graph as a single 
+block otherwise.
+
+:param graph: The graph object.
+:returns: List with the nodes of every block, and list with a dictionary per block mapping its nodes to the number of 
+nodes they represent.
+"""
+def reroute_blocks(graph):
+    if has_positive_integer_fees(graph) and nx.is_strongly_connected(graph):
+        return block_multiplicities(graph)
+    return [set(graph.nodes())], [dict.fromkeys(graph.nodes(), 1)]
+
+
+"""Function that creates the graph of a block, with its nodes in the order of the graph.
+
+:param graph: The graph object.
+:param block: The nodes of the block.
+:returns: The graph of the block.
+"""
+def block_subgraph(graph, block):
+    block_graph = nx.DiGraph()
+    block_graph.add_nodes_from(node for node in graph.nodes() if node in block)
+    block_graph.add_weighted_edges_from((node, succ, data['weight']) for node in block
+                                        for succ, data in graph[node].items() if succ in block)
+    return block_graph
+
+
+"""Function that computes the edge betweenness without the transactions sent by the node at the tail of the edge, 
+equal to nx.edge_betweenness_centrality followed by fee_strategies.remove_own_betweenness_score for every node, per 
+biconnected block (see block_multiplicities). Only the blocks holding edges of the tails are computed.
+Shortest paths only stay within the blocks when every fee is positive, and networkx only finds the same equal length 
+paths from the articulation points as from the sources when the lengths are exact, so a graph that is not strongly 
+connected or has fees that are not positive integers is computed as a single block.
+With a fee of 0 the result differs from remove_own_betweenness_score (see has_zero_fee), calc_node_profit and 
+fee_strategies.compute_node_rew do not use this function for such graphs.
+
+:param graph: The graph object.
+:param tails: The nodes of which the edges need to be computed, None for every edge.
+:returns: Dictionary mapping the edges to their betweenness.
+"""
+def reroute_edge_betweenness(graph, tails=None):
+    blocks, multiplicities = reroute_blocks(graph)
+
+    between_cent = {}
+    for block, multiplicity in zip(blocks, multiplicities):
+        if tails is not None and not any(node in tails for node in block):
+            continue
+        block_graph = block_subgraph(graph, block)
+        block_between_cent, own_dependency = block_dependencies(block_graph, multiplicity, tails)
+        for edge, value in block_between_cent.items():
+            value -= own_dependency.get(edge, 0.0)
+            between_cent[edge] = 0.0 if np.abs(value) < 0.0001 else value
+    return between_cent
@@ -0,0 +1,199 @@
+import hashlib
+import numpy as np
+import betweenness
+
+# Answer the all-pairs queries of the reward and placement strategies from a contraction hierarchy
+use_hierarchy = True
+# Number of topologies of which the contraction order is kept
+max_hierarchies = 8
+hierarchies = {}
+hierarchy_report = {"built": 0, "reused": 0, "customized": 0, "fallbacks": 0}
+
+
+"""Function that computes a fingerprint of the topology of a graph, its nodes (in order) and edges without weights.
+
+:param graph: The graph object.
+:returns: The fingerprint as a hexadecimal string.
+"""
+def topology_fingerprint(graph):
+    edges = sorted((str(src), str(dst)) for src, dst in graph.edges())
+    return hashlib.sha256(repr((list(graph.nodes()), edges)).encode("utf8")).hexdigest()
+
+
+"""Class for a customizable contraction hierarchy of a graph. The preprocessing only depends on the topology: the nodes
+are contracted in minimum degree order on the undirected graph, and every contraction connects the remaining
+neighbours of the node with each other (shortcuts). Every shortest path then consists of arcs going up in the order
+followed by arcs going down. The weights of the arcs are set afterwards by customize, which is cheap, so a hierarchy
+can be reused for every fee of the same topology. Next to the weight, every arc holds the number of shortest paths it
+represents, so the queries also count the shortest paths.
+
+:param graph: The graph object.
+"""
+class ContractionHierarchy:
+
+    def __init__(self, graph):
+        self.nodes = list(graph.nodes())
+        self.node_index = {node: index for index, node in enumerate(self.nodes)}
+        node_amt = len(self.nodes)
+
+        adjacent = np.zeros((node_amt, node_amt), dtype=bool)
+        for src, dst in graph.edges():
+            adjacent[self.node_index[src], self.node_index[dst]] = True
+        adjacent |= adjacent.T
+        np.fill_diagonal(adjacent, False)
+
+        # Contract the node with the fewest remaining neighbours, its neighbours become its upward arcs
+        remaining = np.ones(node_amt, dtype=bool)
+        degrees = adjacent.sum(axis=1)
+        self.order = []
+        self.upward = [None] * node_amt
+        for _ in range(node_amt):
+            node = int(np.argmin(np.where(remaining, degrees, node_amt + 1)))
+            remaining[node] = False
+            neighbours = np.flatnonzero(adjacent[node] & remaining)
+            adjacent[np.ix_(neighbours, neighbours)] = True
+            adjacent[neighbours, neighbours] = False
+            degrees[neighbours] = (adjacent[neighbours] & remaining[None, :]).sum(axis=1)
+            self.order.append(node)
+            self.upward[node] = neighbours
+
+        self.downward = [[] for _ in range(node_amt)]
+        for node in self.order:
+            for neighbour in self.upward[node]:
+                self.downward[neighbour].append(node)
+        self.downward = [np.array(lower, dtype=int) for lower in self.downward]
+        self.shortcuts = sum(len(upper) for upper in self.upward) - graph.to_undirected(as_view=True).number_of_edges()
+        self.weights = None
+        self.counts = None
+
+    """Function that sets the weights of the arcs to the fees of a graph with the same topology. The arcs are processed
+    in contraction order: the lower triangles of an arc (u, v), through nodes contracted before u and v, give the
+    shortest path from u to v over lower nodes only.
+
+    :param graph: The graph object, with the same nodes and edges as the graph of the hierarchy.
+    :returns: Void.
+    """
+    def customize(self, graph):
+        node_amt = len(self.nodes)
+        weights = np.full((node_amt, node_amt), np.inf)
+        counts = np.zeros((node_amt, node_amt))
+        np.fill_diagonal(weights, 0)
+        for src, dst, data in graph.edges(data=True):
+            weights[self.node_index[src], self.node_index[dst]] = data['weight']
+            counts[self.node_index[src], self.node_index[dst]] = 1
+
+        for node in self.order:
+            upper = self.upward[node]
+            if len(upper) < 2:
+                continue
+            block = np.ix_(upper, upper)
+            via = weights[upper, node][:, None] + weights[node, upper][None, :]
+            via_counts = counts[upper, node][:, None] * counts[node, upper][None, :]
+            current = weights[block]
+            counts[block] = np.where(via < current, via_counts,
+                                     np.where(via == current, counts[block] + via_counts, counts[block]))
+            weights[block] = np.minimum(current, via)
+
+        self.weights = weights
+        self.counts = counts
+        hierarchy_report["customized"] += 1
+
+    """Function that computes the distances and numbers of shortest paths from many sources at once (PHAST). The
+    upward arcs are relaxed in contraction order and the downward arcs in reverse order, every step handles all
+    sources together.
+
+    :param sources: The node ID's of the sources, all nodes when it is None.
+    :returns: Matrix with the distances (inf when there is no path) and matrix with the number of shortest paths,
+    indexed as [source, destination] with the destinations in the order of the nodes of the hierarchy.
+    """
+    def distances_and_counts(self, sources=None):
+        source_index = np.arange(len(self.nodes)) if sources is None else \
+            np.array([self.node_index[node] for node in sources], dtype=int)
+        dist = np.full((len(source_index), len(self.nodes)), np.inf)
+        sigma = np.zeros((len(source_index), len(self.nodes)))
+        dist[np.arange(len(source_index)), source_index] = 0
+        sigma[np.arange(len(source_index)), source_index] = 1
+
+        for node in self.order:
+            self.relax(dist, sigma, node, self.downward[node])
+        for node in reversed(self.order):
+            self.relax(dist, sigma, node, self.upward[node])
+        return dist, sigma
+
+    """Function that relaxes the arcs from a set of nodes towards a node, for all sources.
+
+    :param dist: The distance matrix, updated in place.
+    :param sigma: The matrix with the numbers of shortest paths, updated in place.
+    :param node: The index of the node.
+    :param tails: The indices of the nodes the arcs start at.
+    :returns: Void.
+    """
+    def relax(self, dist, sigma, node, tails):
+        if len(tails) == 0:
+            return
+        via = dist[:, tails] + self.weights[tails, node][None, :]
+        best = np.minimum(dist[:, node], np.min(via, axis=1))
+        reached = np.isfinite(best)
+        paths = np.sum(np.where(via == best[:, None], sigma[:, tails] * self.counts[tails, node][None, :], 0), axis=1)
+        sigma[:, node] = np.where(reached, np.where(dist[:, node] == best, sigma[:, node], 0) + paths, 0)
+        dist[:, node] = best
+
+
+"""Function that returns the contraction hierarchy of the topology of a graph, reusing the hierarchy of an earlier
+graph with the same nodes and edges.
+
+:param graph: The graph object.
+:returns: The ContractionHierarchy, not yet customized for the fees of the graph.
+"""
+def get_hierarchy(graph):
+    fingerprint = topology_fingerprint(graph)
+    if fingerprint in hierarchies:
+        hierarchy_report["reused"] += 1
+        hierarchies[fingerprint] = hierarchies.pop(fingerprint)
+        return hierarchies[fingerprint]
+
+    hierarchy = ContractionHierarchy(graph)
+    hierarchy_report["built"] += 1
+    hierarchies[fingerprint] = hierarchy
+    while len(hierarchies) > max_hierarchies:
+        del hierarchies[next(iter(hierarchies))]
+    return hierarchy
+
+
+"""Function that checks whether the queries on a graph can be answered from a contraction hierarchy. This needs positive 
+integer fees: for other fees path lengths can differ in the last bits depending on the order of the additions, so 
+paths of equal length would not be recognized as Dijkstra does.
+
+:param graph: The graph object.
+:returns: Boolean whether the hierarchy is used for the graph.
+"""
+def supports(graph):
+    return use_hierarchy and all(data['weight'] > 0 and float(data['weight']).is_integer()
+                                 for _, _, data in graph.edges(data=True))
+
+
+"""Function that computes the distance and the number of shortest paths between all pairs of nodes, with the same
+results as betweenness.all_pairs_distances_and_counts. Supported graphs (see supports) are answered from the 
+contraction hierarchy of their topology, other graphs use one Dijkstra per source.
+
+:param graph: The graph object.
+:param nodes: The order of the nodes in the matrices.
+:param sources: Optional list of the sources, the rows of the matrices. All nodes (in the order of nodes) when None.
+:returns: Matrix with the distances (inf when there is no path) and matrix with the number of shortest paths, indexed
+as [source, destination].
+"""
+def all_pairs_distances_and_counts(graph, nodes, sources=None):
+    if not supports(graph):
+        hierarchy_report["fallbacks"] += 1
+        dist_matrix, sigma_matrix = betweenness.all_pairs_distances_and_counts(graph, nodes)
+        if sources is None:
+            return dist_matrix, sigma_matrix
+        node_index = {node: index for index, node in enumerate(nodes)}
+        rows = [node_index[node] for node in sources]
+        return dist_matrix[rows], sigma_matrix[rows]
+
+    hierarchy = get_hierarchy(graph)
+    hierarchy.customize(graph)
+    dist_matrix, sigma_matrix = hierarchy.distances_and_counts(nodes if sources is None else sources)
+    columns = [hierarchy.node_index[node] for node in nodes]
+    return dist_matrix[:, columns], sigma_matrix[:, columns]
@@ -0,0 +1,107 @@
+import networkx as nx
+import persistent_graph
+
+# Relative margin by which a witness path needs to be shorter than the edge, so rounding of fees that are not integers
+# can never make the edge part of a shortest path after all
+margin = 1e-9
+
+
+"""Class that finds the edges that are never part of a shortest path, because a path between their endpoints exists 
+that is strictly cheaper than the edge itself. Every such edge is stored together with that path (its witness), as a 
+certificate. Leaving all certified edges out of a graph does not change any distance, nor the set of shortest paths, so 
+the betweenness of the other edges stays the same and the betweenness of the certified edges is 0.
+Kept edges, such as edges whose fee is being optimized, are never left out and never used in a witness, so the 
+certificates hold for every fee they get. A certificate stays valid until the weight of the edge itself changes or an 
+edge of its witness becomes more expensive or disappears, then the edge is checked again.
+
+:param graph: The graph object.
+:param kept_edges: The (source, destination) tuples of the edges that always need to be kept.
+"""
+class EdgePruner:
+
+    def __init__(self, graph, kept_edges=()):
+        self.kept = set(kept_edges)
+        # Certified edges mapped to their weight and the edges of their witness path
+        self.witnesses = {}
+        self.report = {"edges": 0, "pruned": 0, "fraction": 0.0, "invalidated": 0}
+        self.update(graph)
+
+    """Function that brings the certificates up to date with the graph. Certificates that no longer hold are dropped, 
+    after which every edge that is not certified is checked with a Dijkstra from its source, limited to the highest 
+    fee of the edges of that source.
+
+    :param graph: The graph object.
+    :returns: Void.
+    """
+    def update(self, graph):
+        for edge, (weight, witness) in list(self.witnesses.items()):
+            if not graph.has_edge(*edge) or graph[edge[0]][edge[1]]['weight'] != weight or \
+                    not self.is_dominated(graph, weight, witness):
+                del self.witnesses[edge]
+                self.report["invalidated"] += 1
+
+        for src_node in graph.nodes():
+            candidates = [(dst, data['weight']) for dst, data in graph[src_node].items()
+                          if (src_node, dst) not in self.kept and (src_node, dst) not in self.witnesses]
+            if len(candidates) == 0:
+                continue
+            dist, paths = nx.single_source_dijkstra(graph, src_node, cutoff=max(weight for _, weight in candidates),
+                                                    weight=self.witness_weight)
+            for dst, weight in candidates:
+                if dst in dist and dist[dst] * (1 + margin) < weight:
+                    path = paths[dst]
+                    self.witnesses[(src_node, dst)] = (weight, [(path[index], path[index + 1])
+                                                                for index in range(len(path) - 1)])
+
+        self.report["edges"] = len(graph.edges())
+        self.report["pruned"] = len(self.witnesses)
+        self.report["fraction"] = len(self.witnesses) / max(1, len(graph.edges()))
+
+    """Function that gives the weight of an edge for the witness search, kept edges are hidden.
+
+    :param src_node: The source of the edge.
+    :param dst_node: The destination of the edge.
+    :param data: The attribute dictionary of the edge.
+    :returns: The weight, None for a kept edge.
+    """
+    def witness_weight(self, src_node, dst_node, data):
+        if (src_node, dst_node) in self.kept:
+            return None
+        return data['weight']
+
+    """Function that checks if a witness path is still strictly cheaper than an edge.
+
+    :param graph: The graph object.
+    :param weight: The weight of the edge.
+    :param witness: The edges of the witness path.
+    :returns: A boolean indicating whether the edge is still dominated by the path.
+    """
+    def is_dominated(self, graph, weight, witness):
+        length = 0
+        for edge in witness:
+            if edge in self.kept or not graph.has_edge(*edge):
+                return False
+            length += graph[edge[0]][edge[1]]['weight']
+        return length * (1 + margin) < weight
+
+    """Function that returns the certified edges that can be left out while the given edges are kept as well, edges 
+    whose witness uses one of them are kept too.
+
+    :param kept_edges: The (source, destination) tuples of edges to keep in addition to the kept edges of the pruner.
+    :returns: The set of edges that can be left out.
+    """
+    def pruned_edges(self, kept_edges=()):
+        kept_edges = set(kept_edges)
+        return {edge for edge, (_, witness) in self.witnesses.items()
+                if edge not in kept_edges and kept_edges.isdisjoint(witness)}
+
+    """Function that returns the graph the routing computations can use, the graph without the certified edges.
+
+    :param graph: The graph object, with the weights the certificates were last updated with.
+    :param kept_edges: The (source, destination) tuples of edges to keep in addition to the kept edges of the pruner.
+    :returns: The pruned graph, as a PersistentGraph.
+    """
+    def routing_graph(self, graph, kept_edges=()):
+        routing_graph = persistent_graph.fork(graph)
+        routing_graph.remove_edges_from(self.pruned_edges(kept_edges))
+        return routing_graph
@@ -0,0 +1,151 @@
+import contextlib
+import hashlib
+import importlib
+import pickle
+import sqlite3
+import time
+import executor
+import scripts
+
+# Modules whose code determines the results of the cached evaluations. A hash of their source files is stored in every
+# key, so results of any other version of the code are not used.
+code_modules = ["evaluation_cache", "placement_strategies", "fee_strategies", "scripts", "betweenness",
+                "contraction_hierarchy", "landmarks", "edge_pruning", "shortest_paths", "graph_state",
+                "persistent_graph", "executor"]
+# Hash of the source files of code_modules, computed on first use by get_code_version.
+code_version = None
+
+# Path of the SQLite database, None disables the cache.
+cache_path = None
+# Maximal number of evaluations in the cache, the least recently used ones are removed first.
+max_entries = 1000000
+cache_report = {"hits": 0, "misses": 0, "evicted": 0}
+
+
+"""Function that enables the cache (or disables it when path is None).
+
+:param path: The path of the SQLite database, it is created when it does not exist.
+:param entries: The maximal number of evaluations kept in the cache.
+:returns: Void.
+"""
+def set_cache(path, entries=1000000):
+    global cache_path
+    global max_entries
+    cache_path = path
+    max_entries = entries
+    if path is not None:
+        with connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS evaluations "
+                               "(key TEXT PRIMARY KEY, value BLOB NOT NULL, last_used REAL NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS evaluations_last_used ON evaluations (last_used)")
+
+
+"""Function that opens a connection to the cache for a single transaction, to be used in a with statement. Every call 
+opens its own connection, so processes can share the database.
+
+:returns: The sqlite3 Connection, it is committed and closed at the end of the with statement.
+"""
+@contextlib.contextmanager
+def connect():
+    connection = sqlite3.connect(cache_path, timeout=60)
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+"""Function that returns the version of the evaluation code, the hash of the source files of code_modules.
+
+:returns: The version as a hexadecimal string.
+"""
+def get_code_version():
+    global code_version
+    if code_version is None:
+        digest = hashlib.sha256()
+        for module_name in code_modules:
+            with open(importlib.import_module(module_name).__file__, "rb") as source_file:
+                digest.update(source_file.read())
+        code_version = digest.hexdigest()
+    return code_version
+
+
+"""Function that computes the key of an evaluation. Besides the given settings, the key holds the version of the code 
+and the current values of the settings shared with the workers (see executor.shared_settings).
+
+:param kind: The kind of evaluation, for example the name of the job.
+:param fingerprint: The fingerprint of the graph (see scripts.graph_fingerprint).
+:param item: What is evaluated on the graph, for example a (source, candidate) tuple.
+:param settings: Everything else the evaluation depends on, such as the tx amount.
+:returns: The key as a hexadecimal string.
+"""
+def evaluation_key(kind, fingerprint, item, settings):
+    key = (get_code_version(), kind, fingerprint, item, settings, executor.current_settings())
+    return hashlib.sha256(repr(key).encode("utf8")).hexdigest()
+
+
+"""Function that looks up evaluations in the cache.
+
+:param keys: The keys of the evaluations.
+:returns: Dictionary with the results of the keys that were found.
+"""
+def lookup(keys):
+    found = {}
+    with connect() as connection:
+        for index in range(0, len(keys), 500):
+            chunk = keys[index:index + 500]
+            rows = connection.execute("SELECT key, value FROM evaluations WHERE key IN (%s)"
+                                      % ",".join("?" * len(chunk)), chunk).fetchall()
+            for key, value in rows:
+                found[key] = pickle.loads(value)
+        connection.executemany("UPDATE evaluations SET last_used = ? WHERE key = ?",
+                               [(time.time(), key) for key in found])
+    return found
+
+
+"""Function that stores evaluations in the cache, and removes the least recently used evaluations when the cache
+holds more than max_entries.
+
+:param results: Dictionary mapping keys to results.
+:returns: Void.
+"""
+def store(results):
+    with connect() as connection:
+        now = time.time()
+        connection.executemany("INSERT OR REPLACE INTO evaluations (key, value, last_used) VALUES (?, ?, ?)",
+                               [(key, pickle.dumps(value), now) for key, value in results.items()])
+        excess = connection.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0] - max_entries
+        if excess > 0:
+            connection.execute("DELETE FROM evaluations WHERE key IN "
+                               "(SELECT key FROM evaluations ORDER BY last_used ASC LIMIT ?)", (excess,))
+            cache_report["evicted"] += excess
+
+
+"""Function that evaluates a list of items on a graph, taking the results that are in the cache from the cache and
+computing (and storing) the others.
+
+:param kind: The kind of evaluation, for example the name of the job.
+:param graph: The graph the items are evaluated on.
+:param items: The items to evaluate, they need to have a stable repr.
+:param compute: Function that computes the results of a list of items, in the same order.
+:param settings: Everything else the evaluation depends on, such as the tx amount.
+:returns: List with the results, in the order of items.
+"""
+def cached_evaluations(kind, graph, items, compute, settings):
+    if cache_path is None:
+        return compute(items)
+
+    fingerprint = scripts.graph_fingerprint(graph)
+    keys = [evaluation_key(kind, fingerprint, item, settings) for item in items]
+    found = lookup(keys)
+    missing = [index for index, key in enumerate(keys) if key not in found]
+    cache_report["hits"] += len(keys) - len(missing)
+    cache_report["misses"] += len(missing)
+
+    if len(missing) > 0:
+        computed = compute([items[index] for index in missing])
+        new_results = {keys[index]: result for index, result in zip(missing, computed)}
+        store(new_results)
+        found.update(new_results)
+    return [found[key] for key in keys]
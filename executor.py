@@ -0,0 +1,168 @@
+import concurrent.futures
+import importlib
+import pickle
+import psutil
+import persistent_graph
+
+cut_off_amount = 14
+worker_amount = None
+shared_executor = None
+is_worker = False
+# Futures of the speculative tasks that may still be waiting, see submit_speculative_task
+speculative_futures = []
+
+# Module level settings that tasks depend on. Their current values are sent along with every task, so workers that
+# were started before a setting changed still use the right value.
+shared_settings = [("placement_strategies", "global_tx_amt"), ("fee_strategies", "most_freq_fee"),
+                   ("betweenness", "block_decomposition"), ("fee_strategies", "landmark_amt"),
+                   ("contraction_hierarchy", "use_hierarchy"), ("fee_strategies", "prune_edges"),
+                   ("fee_strategies", "ChCost"), ("fee_strategies", "div")]
+
+
+"""Function that sets the number of worker processes of the shared executor, overriding the number of cores.
+
+:param amount: The number of workers, None to derive it from the number of cores again.
+:returns: Void.
+"""
+def set_worker_count(amount):
+    global worker_amount
+    if shared_executor is not None and amount != worker_count():
+        shutdown_executor()
+    worker_amount = amount
+
+
+"""Function that returns the number of worker processes the shared executor uses.
+
+:returns: The number of workers.
+"""
+def worker_count():
+    if worker_amount is not None:
+        return worker_amount
+
+    available_cores = psutil.cpu_count(logical=False) or 1
+    if available_cores - 2 <= cut_off_amount:
+        return max(1, available_cores)
+    return cut_off_amount
+
+
+"""Function that marks a process as a worker of the shared executor.
+
+:returns: Void.
+"""
+def init_worker():
+    global is_worker
+    is_worker = True
+
+
+"""Function that returns the executor shared by all parallel work, creating it when needed.
+
+:returns: The concurrent.futures.ProcessPoolExecutor.
+"""
+def get_executor():
+    global shared_executor
+    if shared_executor is None:
+        print("Starting shared executor with %s workers." % worker_count(), flush=True)
+        shared_executor = concurrent.futures.ProcessPoolExecutor(max_workers=worker_count(), initializer=init_worker)
+    return shared_executor
+
+
+"""Function that stops the shared executor, a new one is created on the next call to get_executor.
+
+:returns: Void.
+"""
+def shutdown_executor():
+    global shared_executor
+    if shared_executor is not None:
+        shared_executor.shutdown(wait=True)
+        shared_executor = None
+
+
+"""Function that reads the current values of the shared settings.
+
+:returns: List of (module name, attribute, value) tuples.
+"""
+def current_settings():
+    settings = []
+    for module_name, attribute in shared_settings:
+        module = importlib.import_module(module_name)
+        settings.append((module_name, attribute, getattr(module, attribute)))
+    return settings
+
+
+"""Function that runs a single task inside a worker, after applying the settings of the process that submitted it.
+
+:param function: The function to run.
+:param args: The arguments of the function.
+:param settings: The settings, as returned by current_settings.
+:returns: The return value of the function.
+"""
+def run_task(function, args, settings):
+    for module_name, attribute, value in settings:
+        setattr(importlib.import_module(module_name), attribute, value)
+    return function(*args)
+
+
+"""Function that submits a task to the shared executor.
+
+:param function: The function to run, it needs to be defined at module level.
+:param args: The arguments of the function.
+:returns: The concurrent.futures.Future of the task.
+"""
+def submit_task(function, args):
+    return get_executor().submit(run_task, function, args, current_settings())
+
+
+"""Function that submits a task that is only speculative, whose result may never be needed. Speculative tasks are
+cancelled as soon as other tasks are submitted through run_tasks, so they never delay those tasks and only use workers
+that would otherwise be idle.
+
+:param function: The function to run, it needs to be defined at module level.
+:param args: The arguments of the function.
+:returns: The concurrent.futures.Future of the task, cancelled when other tasks were submitted before it started.
+"""
+def submit_speculative_task(function, args):
+    future = submit_task(function, args)
+    speculative_futures.append(future)
+    return future
+
+
+"""Function that cancels the speculative tasks that have not started yet. Tasks that are already running finish.
+
+:returns: Void.
+"""
+def cancel_speculative_tasks():
+    global speculative_futures
+    for future in speculative_futures:
+        future.cancel()
+    speculative_futures = []
+
+
+"""Function that creates the copy of the arguments a task works on when it runs in the calling process. Persistent 
+graphs are forked, all other arguments are copied the same way as when they are sent to a worker.
+
+:param args: The arguments of the function.
+:returns: Tuple with the copied arguments.
+"""
+def copy_arguments(args):
+    return tuple(arg.fork() if isinstance(arg, persistent_graph.PersistentGraph) else pickle.loads(pickle.dumps(arg))
+                 for arg in args)
+
+
+"""Function that runs a function for a list of arguments. Inside a worker of the shared executor, or when there is only
+one worker, the tasks are run one after the other in the calling process. This way nested parallel code never spawns
+processes of its own, its tasks end up on the one shared executor instead. In both cases every task works on its own
+copy of the arguments, tasks are free to change the graphs they are given.
+Tasks submitted to the shared executor first cancel the speculative tasks that are still waiting, see
+submit_speculative_task.
+
+:param function: The function to run, it needs to be defined at module level.
+:param args_list: List with a tuple of arguments for every task.
+:returns: List with the return values, in the order of args_list.
+"""
+def run_tasks(function, args_list):
+    if is_worker or worker_count() <= 1 or len(args_list) <= 1:
+        return [function(*copy_arguments(args)) for args in args_list]
+
+    cancel_speculative_tasks()
+    futures = [submit_task(function, args) for args in args_list]
+    return [future.result() for future in futures]
@@ -1,9 +1,12 @@
 import networkx as nx
-import copy
 import numpy as np
-import multiprocessing
 import scripts
-import psutil
+import persistent_graph
+import executor
+import betweenness
+import edge_pruning
+import landmarks
+import contraction_hierarchy
 
 ChCost = 10000
 div = 10
@@ -20,6 +23,17 @@ print_flag = False
 tx_most_freq_fees = {100: 1000.0, 10000: 1010.0, 1000000: 2000.0}
 most_freq_fee = -1
 
+# Leave the edges that are never on a shortest path out of the fee probes of graph_fee_optimization, see
+# edge_pruning.EdgePruner. The pruner is kept between calls, only the certificates affected by changes are redone.
+prune_edges = True
+edge_pruner = None
+
+# Number of landmarks used to skip the pairs that cannot pass through the source of the edge during the fee search of
+# edge_fee_calculation (see landmarks.LandmarkBounds), 0 disables the landmarks. The bounds are computed for every edge
+# whose fee probes are not answered by the contraction hierarchy.
+landmark_amt = 8
+landmark_global = None
+
 """Function that sets a global variable, to be later used within the code.
 
 :param tx_amt: transaction amount that determines which graph we need to obtain the most common fee value for.
@@ -33,52 +47,62 @@ def set_most_freq_fee(tx_amt):
 """Function optimizes the edge fees within a given graph.
 
 :param graph: The graph to be optimized.
+:param edge_list: Optional list of (source, destination) tuples, only these edges are optimized and all other edges 
+keep their fee. All edges are optimized when it is None.
 :returns: The optimized graph.
 """
-def graph_fee_optimization(graph):
-    calculation_graph = copy.deepcopy(graph)
-
-    available_cores = psutil.cpu_count(logical=False)
-    cut_off_amount = 14
-    print("Starting graph optimization with %s cores." % available_cores, flush=True)
-    if available_cores - 2 <= cut_off_amount:
-        cores = available_cores
-    else:
-        cores = cut_off_amount
-
-    pool = multiprocessing.Pool(cores)
+def graph_fee_optimization(graph, edge_list=None):
+    calculation_graph = persistent_graph.fork(graph)
+    print("Starting graph optimization with %s cores." % executor.worker_count(), flush=True)
 
-    edge_list = graph.edges(data=True)
-    pool_list = []
-    new_edges = []
-
-    for edge in edge_list:
-        pool_list.append(pool.apply_async(graph_fee_optimization_job, args=(edge, calculation_graph)))
-    pool.close()
-    pool.join()
+    if edge_list is None:
+        edge_list = graph.edges(data=True)
+    else:
+        edge_list = [scripts.get_edge(graph, edge[0], edge[1]) for edge in edge_list]
 
-    for pool_res in pool_list:
-        new_edges.append(pool_res.get())
+    pruner = update_edge_pruner(calculation_graph) if prune_edges else None
+    new_edges = executor.run_tasks(graph_fee_optimization_job,
+                                   [(edge, calculation_graph, pruner) for edge in edge_list])
 
     for edge in new_edges:
         graph = scripts.add_edge(graph, edge[0], edge[1], edge[2], False)
     return graph
 
 
+"""Function that brings the shared edge pruner up to date with a graph, creating it when needed, and reports the 
+fraction of the edges it leaves out.
+
+:param graph: The graph object.
+:returns: The edge_pruning.EdgePruner.
+"""
+def update_edge_pruner(graph):
+    global edge_pruner
+    if edge_pruner is None:
+        edge_pruner = edge_pruning.EdgePruner(graph)
+    else:
+        edge_pruner.update(graph)
+    print("Pruned %s of %s edges (%.1f%%) from the fee probes." % (edge_pruner.report["pruned"],
+                                                                   edge_pruner.report["edges"],
+                                                                   100 * edge_pruner.report["fraction"]), flush=True)
+    return edge_pruner
+
+
 """Function used for parallelization. It is used to separate the optimization of edge fees into different processes.
 
 :param edge: The edge to be optimized.
 :param calculation_graph: The graph to be used during the optimization process.
+:param pruner: Optional edge_pruning.EdgePruner, up to date with calculation_graph, whose edges are left out of the 
+fee probes.
 :returns: A tuple containing the source node, destination node, and the new, more profitable fee. Or nothing if no fee
 could be found that is more profitable.
 """
-def graph_fee_optimization_job(edge, calculation_graph):
+def graph_fee_optimization_job(edge, calculation_graph, pruner=None):
     src_node = edge[0]
     dest_node = edge[1]
 
     if(print_flag):
         print("Optimizing %s -> %s as part of graph optimization" % (src_node, dest_node), flush=True)
-    new_weight = edge_fee_calculation(calculation_graph, edge)
+    new_weight = edge_fee_calculation(calculation_graph, edge, pruner)
     res = (src_node, dest_node, int(new_weight))
     return res
 
@@ -111,7 +135,7 @@ It seperates this into the rewards the edge brings, and the reward that all othe
 :returns: edge_rew, rest_rew the rewards respectively.
 """
 def compute_node_rew_init(fee, calculation_graph):
-    edge_rew, rest_rew = compute_node_rew(fee, calculation_graph, edge_global)
+    edge_rew, rest_rew = compute_node_rew(fee, calculation_graph, edge_global, landmark_global)
     return edge_rew, rest_rew
 
 
@@ -120,22 +144,49 @@ def compute_node_rew_init(fee, calculation_graph):
 :param fee: The hypothetical fee to be used for calculation.
 :param calculation_graph: The graph snapshot used for the calculation.
 :param edge: The edge  to be used during the calculation.
+:param bounds: Optional landmarks.LandmarkBounds with the edge as variable edge, used to only route the pairs that can 
+pass through the source of the edge. It is not used when the contraction hierarchy supports the graph, see 
+contraction_hierarchy.supports.
 :returns: The optimized graph.
 """
-def compute_node_rew(fee, calculation_graph, edge):
+def compute_node_rew(fee, calculation_graph, edge, bounds=None):
     is_only_reroute = True
 
-    local_graph = copy.deepcopy(calculation_graph)
+    local_graph = persistent_graph.fork(calculation_graph)
     src_node = edge[0]
     dest_node = edge[1]
     weight = fee
 
     local_graph = scripts.add_edge(local_graph, src_node, dest_node, weight, False)
 
-    between_cent = nx.edge_betweenness_centrality(local_graph, normalized=False, weight='weight')
-    if is_only_reroute:
-        src_node = edge[0]
+    if is_only_reroute and contraction_hierarchy.supports(local_graph):
+        # The probes of an edge share their topology, so they share the hierarchy and only customize it
+        nodes = list(local_graph.nodes())
+        node_index = {node: index for index, node in enumerate(nodes)}
+        dist_matrix, sigma_matrix = contraction_hierarchy.all_pairs_distances_and_counts(local_graph, nodes)
+        edge_rewards = betweenness.reroute_edge_rewards(local_graph, src_node, dist_matrix, sigma_matrix, node_index)
+        edge_rew = 0
+        rest_rew = 0
+        for succ, reward in edge_rewards.items():
+            if succ == dest_node:
+                edge_rew += reward
+            else:
+                rest_rew += reward
+        return edge_rew, rest_rew
+    elif is_only_reroute and betweenness.has_zero_fee(local_graph):
+        # The own transactions are only removed correctly from the enumerated paths, see betweenness.has_zero_fee
+        between_cent = nx.edge_betweenness_centrality(local_graph, normalized=False, weight='weight')
         between_cent = remove_own_betweenness_score(local_graph, src_node, between_cent)
+    elif is_only_reroute and bounds is not None:
+        between_cent = bounds.reroute_edge_betweenness(local_graph, src_node, weight)
+    elif is_only_reroute and betweenness.block_decomposition:
+        # Only the edges of the source are used, so only the blocks holding them are computed
+        between_cent = betweenness.reroute_edge_betweenness(local_graph, [src_node])
+    else:
+        between_cent = nx.edge_betweenness_centrality(local_graph, normalized=False, weight='weight')
+        if is_only_reroute:
+            src_node = edge[0]
+            between_cent = remove_own_betweenness_score(local_graph, src_node, between_cent)
 
     edge_list = local_graph.out_edges([src_node], data=True)
     edge_rew = 0
@@ -184,12 +235,15 @@ It does so by trying many values within the search space.
 
 :param graph: The graph object.
 :param edge: The edge to be optimized.
+:param pruner: Optional edge_pruning.EdgePruner, up to date with graph, whose edges are left out of the fee probes. 
+The edge itself is kept, as are the edges whose certificate relies on it.
 :returns: The fee that obtained the highest reward.
 """
-def edge_fee_calculation(graph, edge):
+def edge_fee_calculation(graph, edge, pruner=None):
     global max_rew_fee
     global max_rew
     global edge_global
+    global landmark_global
     global global_max_rew
     global global_rewards
     global edge_global_rew
@@ -206,6 +260,13 @@ def edge_fee_calculation(graph, edge):
 
     # Create/Update edge in graph to do said fee.
     graph = scripts.add_edge(graph, edge[0], edge[1], highest_fee_found, False)
+    if pruner is not None:
+        graph = pruner.routing_graph(graph, [(edge[0], edge[1])])
+    # The bounds hold for every fee of the edge, and are computed with the current fees of the other edges. They are
+    # not needed when every probe, down to highest_fee_found - 1, is answered by the contraction hierarchy.
+    landmark_global = None
+    if landmark_amt > 0 and not (contraction_hierarchy.supports(graph) and highest_fee_found > 1):
+        landmark_global = landmarks.LandmarkBounds(graph, [(edge[0], edge[1])], landmark_amt, first_landmark=edge[0])
 
     # Set max_rew_fee to this value.
     max_rew_fee = highest_fee_found
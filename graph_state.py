@@ -0,0 +1,197 @@
+import heapq
+import weakref
+
+# The index of every graph that has been asked for one. Graphs that are garbage collected drop out automatically.
+graph_states = weakref.WeakKeyDictionary()
+
+
+"""Class that keeps an index of a graph that is updated together with the graph, so the placement strategies do not
+have to scan all nodes and edges on every call. It keeps for every node the set of nodes it shares an edge with (in
+either direction), the degree of every node together with a max-heap over the degrees, and the next free node ID.
+The index is updated by scripts.add_edge, scripts.remove_edge and scripts.add_node, which keeps it fresh without
+comparing it with the graph.
+
+:param graph: The graph object to index.
+"""
+class GraphState:
+
+    def __init__(self, graph):
+        # The adjacency dictionary of the indexed graph, a graph whose dictionaries were replaced gets a new index
+        self.adjacency = graph._adj
+        self.edges = set()
+        self.neighbors = {}
+        self.degree = {}
+        # Insertion order of the nodes, ties in degree are broken by it just like a stable sort on graph.degree()
+        self.rank = {}
+        self.degree_heap = []
+        self.last_node = None
+
+        for node in graph.nodes():
+            self.add_node(node)
+        for (src, dst) in graph.edges():
+            self.add_edge(src, dst)
+
+    """Function that adds a node to the index.
+
+    :param node: The node ID.
+    :returns: Void.
+    """
+    def add_node(self, node):
+        if node in self.rank:
+            return
+        self.rank[node] = len(self.rank)
+        self.neighbors[node] = set()
+        self.degree[node] = 0
+        self.last_node = node
+        heapq.heappush(self.degree_heap, (0, self.rank[node], node))
+
+    """Function that adds an edge to the index, an edge that is already in the index is left as it is.
+
+    :param node1: The source of the edge.
+    :param node2: The destination of the edge.
+    :returns: Void.
+    """
+    def add_edge(self, node1, node2):
+        if (node1, node2) in self.edges:
+            return
+        self.add_node(node1)
+        self.add_node(node2)
+        self.edges.add((node1, node2))
+        self.neighbors[node1].add(node2)
+        self.neighbors[node2].add(node1)
+        self.change_degree(node1, 1)
+        self.change_degree(node2, 1)
+
+    """Function that removes an edge from the index, an edge that is not in the index is ignored.
+
+    :param node1: The source of the edge.
+    :param node2: The destination of the edge.
+    :returns: Void.
+    """
+    def remove_edge(self, node1, node2):
+        if (node1, node2) not in self.edges:
+            return
+        self.edges.remove((node1, node2))
+        # The nodes stay neighbors as long as the edge in the other direction exists
+        if (node2, node1) not in self.edges:
+            self.neighbors[node1].discard(node2)
+            self.neighbors[node2].discard(node1)
+        self.change_degree(node1, -1)
+        self.change_degree(node2, -1)
+
+    """Function that changes the degree of a node, the outdated heap entry is discarded when it is encountered.
+
+    :param node: The node ID.
+    :param change: The change in degree.
+    :returns: Void.
+    """
+    def change_degree(self, node, change):
+        self.degree[node] += change
+        heapq.heappush(self.degree_heap, (-self.degree[node], self.rank[node], node))
+
+    """Function that returns the ID a newly added node should get.
+
+    :returns: The node ID.
+    """
+    def next_node_id(self):
+        return str(int(self.last_node) + 1)
+
+    """Function that checks if two nodes share an edge in either direction.
+
+    :param node1: The first node ID.
+    :param node2: The second node ID.
+    :returns: A boolean indicating whether the nodes are connected.
+    """
+    def is_connected(self, node1, node2):
+        return node1 in self.neighbors and node2 in self.neighbors[node1]
+
+    """Function that returns the nodes node_id can make a new connection with, equal to remove_connected_nodes.
+
+    :param node_id: The node id used to determine if a connection is "new" or already existing.
+    :param nodelist: Optional list that determines the order of the candidates, the insertion order otherwise.
+    :returns: The list of node id's that will lead to a new connection.
+    """
+    def candidates(self, node_id, nodelist=None):
+        if nodelist is None:
+            nodelist = self.rank.keys()
+        connected = self.neighbors.get(node_id, set())
+        return [node for node in nodelist if node != node_id and node not in connected]
+
+    """Function that returns the n candidates of node_id with the highest degree, in the same order as sorting all
+    nodes by degree and then filtering them with remove_connected_nodes.
+
+    :param node_id: The node id used to determine if a connection is "new" or already existing.
+    :param n: The number of candidates.
+    :returns: The list of at most n node id's.
+    """
+    def highest_degree_candidates(self, node_id, n):
+        choices = []
+        popped = []
+        seen = set()
+        while len(self.degree_heap) > 0 and len(choices) < n:
+            entry = heapq.heappop(self.degree_heap)
+            neg_degree, rank, node = entry
+            # Skip outdated and duplicate entries
+            if -neg_degree != self.degree[node] or node in seen:
+                continue
+            seen.add(node)
+            popped.append(entry)
+            if node != node_id and not self.is_connected(node_id, node):
+                choices.append(node)
+
+        for entry in popped:
+            heapq.heappush(self.degree_heap, entry)
+        return choices
+
+
+"""Function that returns the index of a graph, creating it when the graph has none. The functions in scripts keep the 
+index fresh, changes made directly on the graph are noticed only when they change the number of nodes or edges.
+
+:param graph: The graph object.
+:returns: The GraphState of the graph.
+"""
+def get_state(graph):
+    state = graph_states.get(graph)
+    if state is None or state.adjacency is not graph._adj or len(state.rank) != graph.number_of_nodes() or \
+            len(state.edges) != graph.number_of_edges():
+        state = GraphState(graph)
+        graph_states[graph] = state
+    return state
+
+
+"""Function that updates the index of a graph (if it has one) after a new edge has been added to the graph.
+
+:param graph: The graph object.
+:param node1: The source of the edge.
+:param node2: The destination of the edge.
+:returns: Void.
+"""
+def edge_added(graph, node1, node2):
+    state = graph_states.get(graph)
+    if state is not None:
+        state.add_edge(node1, node2)
+
+
+"""Function that updates the index of a graph (if it has one) after an edge has been removed from the graph.
+
+:param graph: The graph object.
+:param node1: The source of the edge.
+:param node2: The destination of the edge.
+:returns: Void.
+"""
+def edge_removed(graph, node1, node2):
+    state = graph_states.get(graph)
+    if state is not None:
+        state.remove_edge(node1, node2)
+
+
+"""Function that updates the index of a graph (if it has one) after a node has been added to the graph.
+
+:param graph: The graph object.
+:param node: The node ID.
+:returns: Void.
+"""
+def node_added(graph, node):
+    state = graph_states.get(graph)
+    if state is not None:
+        state.add_node(node)
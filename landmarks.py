@@ -0,0 +1,190 @@
+import networkx as nx
+import numpy as np
+import heapq
+
+# Relative margin on the bounds, so rounding of fees that are not integers never excludes a pair that is needed
+margin = 1e-9
+
+
+"""Function that computes the distances from a node to all other nodes, or from all other nodes to it.
+
+:param graph: The graph object.
+:param node: The node ID.
+:param nodes: The order of the nodes in the result.
+:param reverse: Boolean that indicates if the distances towards the node should be computed.
+:returns: Array with the distances, inf for nodes that cannot be reached.
+"""
+def distance_row(graph, node, nodes, reverse=False):
+    search_graph = graph.reverse(copy=False) if reverse else graph
+    dist = nx.single_source_dijkstra_path_length(search_graph, node, weight='weight')
+    return np.array([dist.get(other, np.inf) for other in nodes])
+
+
+"""Class with ALT style (A*, landmarks and the triangle inequality) bounds on the distances of a graph in which the 
+fees of some edges, the variable edges, are still to be decided. For a few landmarks the distances from and to every 
+node are stored twice: with the variable edges at fee 0, which gives lower bounds for every fee, and with the variable 
+edges removed, which gives upper bounds for every fee.
+With these bounds reroute_edge_betweenness skips the (source, destination) pairs whose shortest path provably does not 
+pass through a node, and limits the shortest path search of every source to the distance of the furthest destination 
+that is left.
+
+:param graph: The graph object.
+:param variable_edges: The (source, destination) tuples of the edges whose fee is still to be decided.
+:param landmark_amt: The number of landmarks.
+:param first_landmark: Optional first landmark, such as the node whose rewards are computed, the other landmarks are 
+chosen as far away as possible from the landmarks before them.
+"""
+class LandmarkBounds:
+
+    def __init__(self, graph, variable_edges, landmark_amt=8, first_landmark=None):
+        self.nodes = list(graph.nodes())
+        self.node_index = {node: index for index, node in enumerate(self.nodes)}
+        self.variable_edges = set(variable_edges)
+        self.report = {"pairs": 0, "skipped_pairs": 0, "sources": 0, "skipped_sources": 0}
+
+        lower_graph = nx.DiGraph(graph)
+        upper_graph = nx.DiGraph(graph)
+        for src, dst in self.variable_edges:
+            if lower_graph.has_edge(src, dst):
+                lower_graph[src][dst]['weight'] = 0
+                upper_graph.remove_edge(src, dst)
+
+        # Landmarks far apart cover the most directions, distance in hops is used to choose them
+        hop_graph = nx.Graph(graph.to_undirected(as_view=True).edges())
+        if first_landmark is None:
+            first_landmark = max(self.nodes, key=lambda node: graph.degree(node))
+        self.landmarks = [first_landmark]
+        hops = distance_row(hop_graph, first_landmark, self.nodes)
+        while len(self.landmarks) < min(landmark_amt, len(self.nodes)):
+            landmark = self.nodes[int(np.argmax(np.where(np.isfinite(hops), hops, -1)))]
+            if landmark in self.landmarks:
+                break
+            self.landmarks.append(landmark)
+            hops = np.minimum(hops, distance_row(hop_graph, landmark, self.nodes))
+
+        self.lower_from = np.array([distance_row(lower_graph, landmark, self.nodes) for landmark in self.landmarks])
+        self.lower_to = np.array([distance_row(lower_graph, landmark, self.nodes, True) for landmark in self.landmarks])
+        self.upper_from = np.array([distance_row(upper_graph, landmark, self.nodes) for landmark in self.landmarks])
+        self.upper_to = np.array([distance_row(upper_graph, landmark, self.nodes, True) for landmark in self.landmarks])
+
+    """Function that computes lower bounds on the distances from every node to a node, or from the node to every node.
+
+    :param node: The node ID.
+    :param towards: Boolean that indicates if the bounds on the distances towards the node should be computed.
+    :returns: Array with a lower bound per node.
+    """
+    def lower_bounds(self, node, towards):
+        index = self.node_index[node]
+        with np.errstate(invalid='ignore'):
+            if towards:
+                bounds = np.maximum(self.lower_from[:, [index]] - self.lower_from, self.lower_to - self.lower_to[:, [index]])
+            else:
+                bounds = np.maximum(self.lower_from - self.lower_from[:, [index]], self.lower_to[:, [index]] - self.lower_to)
+        return np.max(np.where(np.isnan(bounds), 0, bounds), axis=0).clip(min=0)
+
+    """Function that computes upper bounds on the distances between all pairs of nodes.
+
+    :returns: Matrix with the bounds, indexed as [source, destination].
+    """
+    def upper_bounds(self):
+        bounds = np.full((len(self.nodes), len(self.nodes)), np.inf)
+        for index in range(len(self.landmarks)):
+            np.minimum(bounds, self.upper_to[index][:, None] + self.upper_from[index][None, :], out=bounds)
+        return bounds
+
+    """Function that determines the (source, destination) pairs whose shortest paths can pass through a node, when 
+    the variable edges of the node have the given fee.
+
+    :param graph: The graph object, containing the variable edges.
+    :param node: The node ID.
+    :param fee: The fee of the variable edges.
+    :returns: Boolean matrix indexed as [source, destination].
+    """
+    def relevant_pairs(self, graph, node, fee):
+        to_node = self.lower_bounds(node, True)
+        from_node = np.full(len(self.nodes), np.inf)
+        for succ, data in graph[node].items():
+            weight = fee if (node, succ) in self.variable_edges else data['weight']
+            np.minimum(from_node, weight + self.lower_bounds(succ, False), out=from_node)
+
+        relevant = to_node[:, None] + from_node[None, :] <= self.upper_bounds() * (1 + margin)
+        relevant[self.node_index[node], :] = False
+        np.fill_diagonal(relevant, False)
+        return relevant
+
+    """Function that computes the betweenness of the edges of a node without the transactions the node sends itself, 
+    equal to betweenness.reroute_edge_betweenness(graph, [node]), using only the pairs that can pass through the node.
+
+    :param graph: The graph object, containing the variable edges with the given fee.
+    :param node: The node ID.
+    :param fee: The fee of the variable edges.
+    :returns: Dictionary mapping the edges of the node to their betweenness.
+    """
+    def reroute_edge_betweenness(self, graph, node, fee):
+        relevant = self.relevant_pairs(graph, node, fee)
+        upper_bounds = self.upper_bounds()
+        between_cent = {(node, succ): 0.0 for succ in graph[node]}
+        self.report["pairs"] += len(self.nodes) * (len(self.nodes) - 1)
+        self.report["skipped_pairs"] += len(self.nodes) * (len(self.nodes) - 1) - int(np.sum(relevant))
+        self.report["sources"] += len(self.nodes)
+
+        for src_index, src_node in enumerate(self.nodes):
+            destinations = {self.nodes[index] for index in np.flatnonzero(relevant[src_index])}
+            if len(destinations) == 0:
+                self.report["skipped_sources"] += 1
+                continue
+            cutoff = np.max(upper_bounds[src_index, relevant[src_index]]) * (1 + margin)
+            stack, preds, sigma = bounded_shortest_paths(graph, src_node, cutoff)
+
+            delta = dict.fromkeys(stack, 0)
+            while stack:
+                dst_node = stack.pop()
+                coeff = ((1 if dst_node in destinations else 0) + delta[dst_node]) / sigma[dst_node]
+                for pred in preds[dst_node]:
+                    contribution = sigma[pred] * coeff
+                    if pred == node:
+                        between_cent[(node, dst_node)] += contribution
+                    delta[pred] += contribution
+
+        for edge, value in between_cent.items():
+            between_cent[edge] = 0.0 if np.abs(value) < 0.0001 else value
+        return between_cent
+
+
+"""Function that computes the shortest path DAG from a source, as networkx' Brandes implementation does, but stops at 
+the nodes further away than cutoff.
+
+:param graph: The graph object.
+:param src_node: The source.
+:param cutoff: The maximal distance.
+:returns: The nodes in order of distance, the predecessors of every node and the number of shortest paths to every node.
+"""
+def bounded_shortest_paths(graph, src_node, cutoff):
+    stack = []
+    preds = {src_node: []}
+    sigma = {src_node: 1.0}
+    dist = {}
+    seen = {src_node: 0}
+    queue = [(0, 0, src_node, src_node)]
+    counter = 1
+    while queue:
+        node_dist, _, pred, node = heapq.heappop(queue)
+        if node in dist:
+            continue
+        if node_dist > cutoff:
+            break
+        sigma[node] += sigma[pred]
+        stack.append(node)
+        dist[node] = node_dist
+        for succ, data in graph[node].items():
+            succ_dist = node_dist + data['weight']
+            if succ not in dist and (succ not in seen or succ_dist < seen[succ]):
+                seen[succ] = succ_dist
+                heapq.heappush(queue, (succ_dist, counter, node, succ))
+                counter += 1
+                sigma[succ] = 0.0
+                preds[succ] = [node]
+            elif succ_dist == seen[succ]:
+                sigma[succ] += sigma[node]
+                preds[succ].append(node)
+    return stack, preds, sigma
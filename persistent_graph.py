@@ -0,0 +1,226 @@
+import networkx as nx
+
+
+"""Class for a directed graph of which cheap snapshots (forks) can be made, for the many hypothetical graphs that are
+created while simulating reactions. A fork only copies the outer dictionaries of the graph (one pointer per node), the
+dictionaries holding the edges of every node are shared between the graph and its forks. A graph copies the edges of a
+node the first time it changes them after a fork (copy-on-write), so the memory of a fork grows with the number of
+nodes whose edges changed instead of with the number of edges. The attribute dictionaries of nodes and edges are never
+changed in place, a changed edge gets a new dictionary.
+All changes need to go through the methods of the graph, changing an attribute dictionary directly (for example
+graph[u][v]['weight'] = fee) also changes it in every fork.
+
+:param incoming_graph_data: Optional graph (or other data accepted by nx.DiGraph) to initialize the graph with.
+:param attr: Graph attributes.
+"""
+class PersistentGraph(nx.DiGraph):
+
+    def __init__(self, incoming_graph_data=None, **attr):
+        # Nodes whose successor and predecessor dictionaries belong to this graph only
+        self._owned_succ = set()
+        self._owned_pred = set()
+        super().__init__(incoming_graph_data, **attr)
+
+    """Function that creates a snapshot of the graph, afterwards both graphs can be changed independently.
+
+    :returns: The new PersistentGraph.
+    """
+    def fork(self):
+        graph = self.__class__.__new__(self.__class__)
+        graph.graph = dict(self.graph)
+        graph._node = dict(self._node)
+        graph._succ = dict(self._succ)
+        graph._adj = graph._succ
+        graph._pred = dict(self._pred)
+        graph.__networkx_cache__ = {}
+        graph._owned_succ = set()
+        graph._owned_pred = set()
+
+        # The inner dictionaries are now shared with the fork
+        self._owned_succ = set()
+        self._owned_pred = set()
+        return graph
+
+    """Function that makes copy.deepcopy create a fork, since a fork behaves like a deep copy.
+
+    :param memo: The memo dictionary of copy.deepcopy.
+    :returns: The new PersistentGraph.
+    """
+    def __deepcopy__(self, memo):
+        graph = self.fork()
+        memo[id(self)] = graph
+        return graph
+
+    """Function that makes sure the successors of a node can be changed without affecting other graphs.
+
+    :param node: The node ID.
+    :returns: The successor dictionary of the node.
+    """
+    def _own_successors(self, node):
+        if node not in self._owned_succ:
+            self._succ[node] = dict(self._succ[node])
+            self._owned_succ.add(node)
+        return self._succ[node]
+
+    """Function that makes sure the predecessors of a node can be changed without affecting other graphs.
+
+    :param node: The node ID.
+    :returns: The predecessor dictionary of the node.
+    """
+    def _own_predecessors(self, node):
+        if node not in self._owned_pred:
+            self._pred[node] = dict(self._pred[node])
+            self._owned_pred.add(node)
+        return self._pred[node]
+
+    """Function that clears the cache networkx keeps of results computed on the graph.
+
+    :returns: Void.
+    """
+    def _clear_cache(self):
+        cache = getattr(self, "__networkx_cache__", None)
+        if cache:
+            cache.clear()
+
+    """Function that adds a node, or updates its attributes if it already exists.
+
+    :param node_for_adding: The node ID.
+    :param attr: Node attributes.
+    :returns: Void.
+    """
+    def add_node(self, node_for_adding, **attr):
+        if node_for_adding not in self._succ:
+            if node_for_adding is None:
+                raise ValueError("None cannot be a node")
+            self._succ[node_for_adding] = {}
+            self._pred[node_for_adding] = {}
+            self._node[node_for_adding] = dict(attr)
+            self._owned_succ.add(node_for_adding)
+            self._owned_pred.add(node_for_adding)
+        elif len(attr) > 0:
+            node_data = dict(self._node[node_for_adding])
+            node_data.update(attr)
+            self._node[node_for_adding] = node_data
+        self._clear_cache()
+
+    """Function that adds multiple nodes, see nx.DiGraph.add_nodes_from.
+
+    :param nodes_for_adding: Node ID's or (node ID, attribute dict) tuples.
+    :param attr: Attributes for all nodes.
+    :returns: Void.
+    """
+    def add_nodes_from(self, nodes_for_adding, **attr):
+        for node in nodes_for_adding:
+            if isinstance(node, tuple) and len(node) == 2 and isinstance(node[1], dict):
+                self.add_node(node[0], **dict(attr, **node[1]))
+            else:
+                self.add_node(node, **attr)
+
+    """Function that removes a node and its edges.
+
+    :param n: The node ID.
+    :returns: Void.
+    """
+    def remove_node(self, n):
+        if n not in self._succ:
+            raise nx.NetworkXError(f"The node {n} is not in the digraph.")
+        for succ in self._succ[n]:
+            del self._own_predecessors(succ)[n]
+        for pred in self._pred[n]:
+            del self._own_successors(pred)[n]
+        del self._succ[n]
+        del self._pred[n]
+        del self._node[n]
+        self._owned_succ.discard(n)
+        self._owned_pred.discard(n)
+        self._clear_cache()
+
+    """Function that removes multiple nodes, nodes that are not in the graph are ignored.
+
+    :param nodes: The node ID's.
+    :returns: Void.
+    """
+    def remove_nodes_from(self, nodes):
+        for node in list(nodes):
+            if node in self._succ:
+                self.remove_node(node)
+
+    """Function that adds an edge, or updates its attributes if it already exists.
+
+    :param u_of_edge: The source of the edge.
+    :param v_of_edge: The destination of the edge.
+    :param attr: Edge attributes, such as weight.
+    :returns: Void.
+    """
+    def add_edge(self, u_of_edge, v_of_edge, **attr):
+        for node in (u_of_edge, v_of_edge):
+            if node not in self._succ:
+                self.add_node(node)
+
+        edge_data = dict(self._succ[u_of_edge].get(v_of_edge, {}))
+        edge_data.update(attr)
+        self._own_successors(u_of_edge)[v_of_edge] = edge_data
+        self._own_predecessors(v_of_edge)[u_of_edge] = edge_data
+        self._clear_cache()
+
+    """Function that adds multiple edges, see nx.DiGraph.add_edges_from.
+
+    :param ebunch_to_add: (source, destination) or (source, destination, attribute dict) tuples.
+    :param attr: Attributes for all edges.
+    :returns: Void.
+    """
+    def add_edges_from(self, ebunch_to_add, **attr):
+        for edge in ebunch_to_add:
+            if len(edge) == 3:
+                self.add_edge(edge[0], edge[1], **dict(attr, **edge[2]))
+            elif len(edge) == 2:
+                self.add_edge(edge[0], edge[1], **attr)
+            else:
+                raise nx.NetworkXError(f"Edge tuple {edge} must be a 2-tuple or 3-tuple.")
+
+    """Function that removes an edge.
+
+    :param u: The source of the edge.
+    :param v: The destination of the edge.
+    :returns: Void.
+    """
+    def remove_edge(self, u, v):
+        if u not in self._succ or v not in self._succ[u]:
+            raise nx.NetworkXError(f"The edge {u}-{v} not in graph.")
+        del self._own_successors(u)[v]
+        del self._own_predecessors(v)[u]
+        self._clear_cache()
+
+    """Function that removes multiple edges, edges that are not in the graph are ignored.
+
+    :param ebunch: (source, destination, ...) tuples.
+    :returns: Void.
+    """
+    def remove_edges_from(self, ebunch):
+        for edge in list(ebunch):
+            if self.has_edge(edge[0], edge[1]):
+                self.remove_edge(edge[0], edge[1])
+
+    """Function that removes all edges, but keeps the nodes.
+
+    :returns: Void.
+    """
+    def clear_edges(self):
+        for node in self._succ:
+            self._succ[node] = {}
+            self._pred[node] = {}
+        self._owned_succ = set(self._succ)
+        self._owned_pred = set(self._pred)
+        self._clear_cache()
+
+
+"""Function that creates a snapshot of a graph that can be changed without affecting the graph. A PersistentGraph is
+forked, any other graph is converted into a PersistentGraph so that snapshots of the result are cheap.
+
+:param graph: The graph object.
+:returns: The PersistentGraph.
+"""
+def fork(graph):
+    if isinstance(graph, PersistentGraph):
+        return graph.fork()
+    return PersistentGraph(graph)
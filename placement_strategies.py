@@ -1,14 +1,38 @@
 import networkx as nx
 import numpy as np
 import scripts
+import persistent_graph
 import fee_strategies
-import copy
-import multiprocessing
-import psutil
+import shortest_paths
+import graph_state
+import betweenness
+import contraction_hierarchy
+import executor
+import evaluation_cache
+import heapq
 
 tx_most_freq_fees = {100: 1000.0, 10000: 1010.0, 1000000: 2000.0}
 global_tx_amt = -1
 
+# Counters of the last lazy greedy placement, see lazy_fee_weighted_centrality.
+lazy_greedy_report = {"evaluations": 0, "re_evaluations": 0, "placed": 0}
+# Guarantee achieved by the last approximate betweenness placement, see betweenness_centrality.
+betweenness_report = {}
+# Differences between the full and the bounded network reaction, see compare_reaction_models.
+reaction_model_report = {}
+# Candidates evaluated by the last beam search of game_theory, with [bound, post-reaction reward, reward <= bound]
+# for every evaluated candidate in the style of minimum_reward_check.
+beam_report = {}
+# Search statistics of the last game_theory_lookahead call.
+lookahead_report = {}
+# Iterations and conflicts of the last simultaneous_best_responses call.
+simultaneous_report = {}
+# Number of top ranked candidates for which the next round is evaluated speculatively, 0 disables speculation.
+speculation_width = 0
+# Evaluations of the next round that have been started, keyed by the graph they assume, see speculate_next_round.
+speculations = {}
+speculation_report = {"started": 0, "hits": 0, "cancelled": 0}
+
 """Function that sets a global variable, to be later used within the code.
 
 :param tx_amt: the value to be set.
@@ -18,6 +42,19 @@ def set_most_freq_fee(tx_amt):
     global_tx_amt = tx_amt
 
 
+"""Function that sets the number of top ranked candidates for which the next placement round is evaluated 
+speculatively, see speculate_next_round.
+
+:param width: The number of candidates, 0 disables speculation.
+:returns: Void.
+"""
+def set_speculation(width):
+    global speculation_width
+    speculation_width = width
+    if width <= 0:
+        cancel_speculations()
+
+
 """Function that takes as input the list of nodes and a node within a graph and removes the id's that are already 
 connected. It returns a list of node id's that are not yet connected, from which then the best connection can be 
 calculated.
@@ -78,7 +115,7 @@ def uniform_random(graph, node_id, n, needs_optimization, seed=None):
         np.random.seed(seed)
 
     # Filter nodes already connected with
-    node_candidates = remove_connected_nodes(graph.nodes(), graph.edges(data=True), node_id)
+    node_candidates = graph_state.get_state(graph).candidates(node_id)
 
     # Pick n node(s) our of the new connection
     if n <= len(node_candidates):
@@ -104,17 +141,9 @@ existing connections they have. Then the top n nodes are chosen to make this con
 :returns: The graph to which edges have been added.
 """
 def highest_degree(graph, node_id, n, src_needs_optimization):
-    # Sort by degree
-    deg_list = sorted(graph.degree(), key=lambda node: node[1], reverse=True)
-
-    # Map sorted degree list to node id's and filter out the nodes already connected
-    node_candidates = remove_connected_nodes([tup[0] for tup in deg_list], graph.edges(data=True), node_id)
+    # Take the n nodes with the highest degree that are not connected yet from the degree heap
+    choices = graph_state.get_state(graph).highest_degree_candidates(node_id, n)
 
-    # Pick n node(s) our of the new connection
-    if n <= len(node_candidates):
-        choices = node_candidates[0:n]
-    else:
-        choices = node_candidates
     # Add the chosen edges to the network
     print("Choice(s): ", choices)
     graph = create_edges(graph, choices, node_id, src_needs_optimization)
@@ -132,21 +161,40 @@ the edge with the highest simulated use will be created within the graph.
 :param node_id: The source for the edges that need to be created.
 :param n: The number of edges that need to be created using this strategy.
 :param src_needs_optimization: Boolean that indicates if the newly created edge needs to have their fee optimized.
+:param approximate: Boolean that indicates if the betweenness should be estimated by sampling shortest paths, see
+betweenness.approximate_top_k_betweenness. The achieved guarantee is stored in betweenness_report.
+:param delta: The allowed probability that the guarantee of the approximation does not hold.
+:param seed: The seed used to sample shortest paths.
+:param engine: Optional betweenness.IncrementalBetweenness that follows the graph across rounds, the exact betweenness 
+is then taken from it instead of being recomputed.
 :returns: The graph to which edges have been added.
 """
-def betweenness_centrality(graph, node_id, n, src_needs_optimization):
-    # Record the centrality
-    between_cent = nx.betweenness_centrality(graph, normalized=False, weight='weight')
-    between_cent_sorted = sorted(between_cent.items(), key=lambda x: x[1], reverse=True)
-
-    # Map sorted degree list to node id's and filter out the nodes already connected
-    node_candidates = remove_connected_nodes([tup[0] for tup in between_cent_sorted], graph.edges(data=True), node_id)
-
-    # Pick n node(s) our of the new connection
-    if n <= len(node_candidates):
-        choices = node_candidates[0:n]
+def betweenness_centrality(graph, node_id, n, src_needs_optimization, approximate=False, delta=0.1, seed=None,
+                           engine=None):
+    global betweenness_report
+    if approximate:
+        node_candidates = graph_state.get_state(graph).candidates(node_id)
+        choices, between_cent, betweenness_report = betweenness.approximate_top_k_betweenness(graph, node_candidates,
+                                                                                               n, delta=delta,
+                                                                                               seed=seed)
+        print("Approximate betweenness:", betweenness_report, flush=True)
     else:
-        choices = node_candidates
+        # Record the centrality
+        if engine is not None:
+            engine.update(graph)
+            between_cent = engine.node_betweenness()
+        else:
+            between_cent = nx.betweenness_centrality(graph, normalized=False, weight='weight')
+        between_cent_sorted = sorted(between_cent.items(), key=lambda x: x[1], reverse=True)
+
+        # Map sorted degree list to node id's and filter out the nodes already connected
+        node_candidates = graph_state.get_state(graph).candidates(node_id, [tup[0] for tup in between_cent_sorted])
+
+        # Pick n node(s) our of the new connection
+        if n <= len(node_candidates):
+            choices = node_candidates[0:n]
+        else:
+            choices = node_candidates
 
     # Add the chosen edges to the network
     print("Choice(s):", choices)
@@ -166,19 +214,18 @@ node in the network, the closer every other node in the network is to each other
 :returns: The graph to which edges have been added.
 """
 def k_center(graph, node_id, n, src_needs_optimization):
+    # The shortest paths from node_id are updated for every edge that is created, see IncrementalSSSP for when they
+    # are recomputed
+    paths = shortest_paths.IncrementalSSSP(graph, node_id)
     for i in range(n):
-        dist_dict = nx.single_source_dijkstra_path(graph, node_id, weight='weight')
-        dist_dict.pop(node_id)
-
-        longest_path_length = -1
-        longest_path_destination = -1
-        for path in dist_dict.values():
-            if len(path) > longest_path_length and len(path) > 2:
-                longest_path_length = len(path)
-                longest_path_destination = path[-1]
+        longest_path_destination = paths.longest_path_destination()
 
         if longest_path_destination != -1:
+            old_weight = None
+            if graph.has_edge(node_id, longest_path_destination):
+                old_weight = graph[node_id][longest_path_destination]['weight']
             graph = create_edges(graph, [longest_path_destination], node_id, src_needs_optimization)
+            paths.update_edge(graph, node_id, longest_path_destination, old_weight)
     return graph
 
 
@@ -193,40 +240,95 @@ The strategy used in this function is k-means. Here the aim is to lower the aver
 """
 def k_means(graph, node_id, n, src_needs_optimization):
     # Init
-    node_candidates = remove_connected_nodes(graph.nodes(), graph.edges(data=True), node_id)
-    removed_candidates = []
-    all_nodes = graph.nodes()
+    node_candidates = graph_state.get_state(graph).candidates(node_id)
+    remaining_candidates = set(node_candidates)
+    removed_candidates = set()
+
+    # For every candidate keep the distance to its closest observing node, and per observing node the candidates
+    # that depend on it. Ties are broken by the order of the candidates, as in the exhaustive search.
+    candid_order = {}
+    nearest_source = {}
+    dependants = {}
+    queue = []
+    for index, node_candid in enumerate(node_candidates):
+        candid_order[node_candid] = index
+        candid_dist, source = nearest_observation(graph, node_candid, removed_candidates)
+        nearest_source[node_candid] = (candid_dist, source)
+        dependants.setdefault(source, set()).add(node_candid)
+        queue.append((candid_dist, index, node_candid))
+    heapq.heapify(queue)
 
     # Analyze the node candidates until only n remain
-    while len(node_candidates) > n:
-        min_candid_distance = float('inf')
-        min_candid_id = -1
-
-        # Compute which of the candidates is the closest if we take the rest of the graph as source
-        for node_candid in node_candidates:
-            observation_list = all_nodes - removed_candidates
-            observation_list.remove(node_candid)
-
-            res = nx.multi_source_dijkstra_path_length(graph, observation_list, weight='weight')
-            candid_dist = res[node_candid]
-
-            # Store minimal distance
-            if candid_dist < min_candid_distance and node_candid in node_candidates:
-                min_candid_id = node_candid
-                min_candid_distance = candid_dist
-        # Remove the closest node
-        if min_candid_id != -1:
-            removed_candidates.append(min_candid_id)
-            node_candidates.remove(min_candid_id)
+    while len(remaining_candidates) > n and len(queue) > 0:
+        candid_dist, index, min_candid_id = heapq.heappop(queue)
+
+        # Skip entries of removed candidates and outdated distances
+        if min_candid_id not in remaining_candidates or nearest_source[min_candid_id][0] != candid_dist:
+            continue
         # Check that should never be reached
-        elif min_candid_id == -1:
+        if candid_dist == float('inf'):
             break
 
+        # Remove the closest node
+        remaining_candidates.remove(min_candid_id)
+        removed_candidates.add(min_candid_id)
+
+        # Only the candidates that were closest to the removed node can have a larger distance now
+        for node_candid in dependants.pop(min_candid_id, set()):
+            if node_candid not in remaining_candidates:
+                continue
+            candid_dist, source = nearest_observation(graph, node_candid, removed_candidates)
+            nearest_source[node_candid] = (candid_dist, source)
+            dependants.setdefault(source, set()).add(node_candid)
+            heapq.heappush(queue, (candid_dist, candid_order[node_candid], node_candid))
+
     # Create the edges to the chosen nodes
-    graph = create_edges(graph, node_candidates, node_id, src_needs_optimization)
+    choices = [node_candid for node_candid in node_candidates if node_candid in remaining_candidates]
+    graph = create_edges(graph, choices, node_id, src_needs_optimization)
     return graph
 
 
+"""Function that finds the observing node closest to a candidate, used as part of k_means. All nodes that are not 
+removed, except the candidate itself, are observing nodes. The search runs backwards from the candidate and stops at 
+the first observing node it settles.
+
+:param graph: The graph object.
+:param node_candid: The candidate ID.
+:param removed_candidates: Set of node ID's that are no longer observing nodes.
+:returns: A tuple containing the distance from the closest observing node to the candidate, and that node.
+"""
+def nearest_observation(graph, node_candid, removed_candidates):
+    dist = {node_candid: 0}
+    next_hop = {}
+    settled = set()
+    queue = [(0, 0, node_candid)]
+    counter = 1
+
+    while len(queue) > 0:
+        node_dist, _, node = heapq.heappop(queue)
+        if node in settled:
+            continue
+        settled.add(node)
+
+        if node != node_candid and node not in removed_candidates:
+            # Sum the path in the forward direction, in the same order as a forward Dijkstra would
+            path_dist = 0
+            hop = node
+            while hop != node_candid:
+                path_dist = path_dist + graph[hop][next_hop[hop]]['weight']
+                hop = next_hop[hop]
+            return path_dist, node
+
+        for pred, edge_data in graph.pred[node].items():
+            pred_dist = node_dist + edge_data['weight']
+            if pred not in settled and (pred not in dist or pred_dist < dist[pred]):
+                dist[pred] = pred_dist
+                next_hop[pred] = node
+                heapq.heappush(queue, (pred_dist, counter, pred))
+                counter += 1
+    return float('inf'), None
+
+
 """Function for determining how to create new edges connecting a node further to the graph.
 The strategy used in this function is fee weighted centrality (or greedy). This strategy similar to betweenness 
 centrality makes use of the betweenness centrality metric. However this strategy optimizes the weighted fee and edge 
@@ -236,33 +338,23 @@ Note that this method always optimized their fee, therefore there is no src_need
 :param graph: The graph object one wishes to add an edge to.
 :param node_id: The source for the edges that need to be created.
 :param n: The number of edges that need to be created using this strategy.
+:param lazy: Boolean that indicates if the edges should be placed using lazy greedy evaluation (only used when n > 1).
 :returns: The graph to which edges have been added.
 """
-def fee_weighted_centrality(graph, node_id, n):
-    global global_tx_amt
+def fee_weighted_centrality(graph, node_id, n, lazy=False):
+    if lazy and n > 1:
+        return lazy_fee_weighted_centrality(graph, node_id, n)
+
     # Create n new edges
     for i in range(n):
-        # Create copy for computation
-        calculation_graph = copy.deepcopy(graph)
-
         # Create new connections list.
-        node_candidates = remove_connected_nodes(calculation_graph.nodes(), calculation_graph.edges(data=True), node_id)
+        node_candidates = graph_state.get_state(graph).candidates(node_id)
 
-        # Init multiprocessing
-        available_cores = psutil.cpu_count(logical=False)
-        pool = multiprocessing.Pool(available_cores - 2)
-        pool_list = []
-        edge_candidates = []
+        # Create copy for computation
+        calculation_graph = persistent_graph.fork(graph)
 
         # Try all possible connections in parallel and store
-        for node_candid in node_candidates:
-            pool_list.append(pool.apply_async(fee_weighted_centrality_job,
-                                              args=(calculation_graph, node_id, node_candid, global_tx_amt)))
-        pool.close()
-        pool.join()
-
-        for pool_res in pool_list:
-            edge_candidates.append(pool_res.get())
+        edge_candidates = evaluate_edge_candidates(calculation_graph, node_id, node_candidates)
 
         # Sort list by reward
         edge_candidates.sort(key=lambda y: y[3], reverse=True)
@@ -272,10 +364,345 @@ def fee_weighted_centrality(graph, node_id, n):
             chosen_candid = edge_candidates[0]
             graph = create_edges(graph, [chosen_candid[1]], chosen_candid[0], False, given_src_fee=chosen_candid[2])
             print("Final choice %s -> %s, fee: %s, reward: %s" % (chosen_candid[0], chosen_candid[1], chosen_candid[2], chosen_candid[3]))
+            if i == n - 1:
+                speculate_next_round(calculation_graph, node_id, edge_candidates)
+
+    return graph
+
+
+"""Function that places multiple edges with the fee weighted centrality strategy using lazy greedy (CELF) evaluation.
+Every candidate is scored once, after which a priority queue keeps the last known marginal reward of each candidate.
+Only the top of the queue is re-evaluated against the current graph, until the top entry is up to date. When the 
+marginal rewards can only decrease as edges are added, the result is identical to calling fee_weighted_centrality.
+The number of (re-)evaluations is stored in lazy_greedy_report.
+
+:param graph: The graph object one wishes to add an edge to.
+:param node_id: The source for the edges that need to be created.
+:param n: The number of edges that need to be created using this strategy.
+:returns: The graph to which edges have been added.
+"""
+def lazy_fee_weighted_centrality(graph, node_id, n):
+    global global_tx_amt
+    global lazy_greedy_report
+    lazy_greedy_report = {"evaluations": 0, "re_evaluations": 0, "placed": 0}
 
+    node_candidates = graph_state.get_state(graph).candidates(node_id)
+    calculation_graph = persistent_graph.fork(graph)
+
+    # Score every candidate once against the starting graph
+    base_reward = node_reward(calculation_graph, node_id)
+    edge_candidates = evaluate_edge_candidates(calculation_graph, node_id, node_candidates)
+    lazy_greedy_report["evaluations"] += len(edge_candidates)
+
+    # Entries are (-marginal reward, candidate order, candidate, fee, round in which the entry was evaluated)
+    queue = []
+    for index, candid in enumerate(edge_candidates):
+        queue.append((-(candid[3] - base_reward), index, candid[1], candid[2], 0))
+    heapq.heapify(queue)
+
+    for i in range(n):
+        chosen_candid = None
+        while len(queue) > 0:
+            neg_gain, index, node_candid, fee, evaluated_round = heapq.heappop(queue)
+
+            # An entry that is up to date and still on top can not be beaten by any other candidate
+            if evaluated_round == i:
+                chosen_candid = (node_id, node_candid, fee, base_reward - neg_gain)
+                break
+
+            res = fee_weighted_centrality_job(graph, node_id, node_candid, global_tx_amt)
+            lazy_greedy_report["evaluations"] += 1
+            lazy_greedy_report["re_evaluations"] += 1
+            heapq.heappush(queue, (-(res[3] - base_reward), index, node_candid, res[2], i))
+
+        if chosen_candid is None:
+            break
+
+        graph = create_edges(graph, [chosen_candid[1]], chosen_candid[0], False, given_src_fee=chosen_candid[2])
+        lazy_greedy_report["placed"] += 1
+        print("Final choice %s -> %s, fee: %s, reward: %s" % (chosen_candid[0], chosen_candid[1], chosen_candid[2], chosen_candid[3]))
+
+        base_reward = node_reward(graph, node_id)
+
+    print("Lazy greedy: %s evaluations, of which %s re-evaluations." % (lazy_greedy_report["evaluations"],
+                                                                      lazy_greedy_report["re_evaluations"]), flush=True)
     return graph
 
 
+"""Function that scores every candidate connection of a node in parallel.
+
+:param calculation_graph: A snapshot of the graph object for analysis.
+:param node_id: The source for the edges that need to be created.
+:param node_candidates: The candidate destination ID's.
+:returns: A list of (source, destination, fee, reward) tuples in the order of node_candidates.
+"""
+def evaluate_edge_candidates(calculation_graph, node_id, node_candidates):
+    global global_tx_amt
+    speculated = use_speculation(calculation_graph, node_id, node_candidates) or {}
+    missing = [node_candid for node_candid in node_candidates if node_candid not in speculated]
+    evaluated = dict(zip(missing, evaluation_cache.cached_evaluations(
+        "fee_weighted_centrality_job", calculation_graph, [(node_id, node_candid) for node_candid in missing],
+        lambda items: executor.run_tasks(fee_weighted_centrality_job,
+                                         [(calculation_graph, item[0], item[1], global_tx_amt) for item in items]),
+        (global_tx_amt,))))
+    return [speculated[node_candid] if node_candid in speculated else evaluated[node_candid]
+            for node_candid in node_candidates]
+
+
+"""Function that starts the evaluation of the next placement round on the idle workers of the shared executor, while 
+the current round is finished by the caller (for example calc_node_profit in the drivers). For each of the 
+speculation_width best ranked candidates the graph in which it has been placed is created, and the candidates of the 
+next round are submitted for that graph. The next call to evaluate_edge_candidates uses the results if its graph is 
+equal to one of these graphs, all other speculative evaluations are cancelled. 
+The evaluations are speculative tasks of the shared executor (see executor.submit_speculative_task): the ones that have 
+not started when other work is submitted, such as the next graph_fee_optimization or a parallel calc_node_profit, are 
+cancelled so they never delay it. Only the evaluations that finished on otherwise idle workers are then used.
+Nothing is started when there is only one worker, or when called inside a worker.
+
+:param calculation_graph: A snapshot of the graph before the current round placed its edge.
+:param node_id: The source of the edges.
+:param ranked_candidates: The candidates of the current round as (source, destination, fee, ...) tuples, best first.
+:returns: Void.
+"""
+def speculate_next_round(calculation_graph, node_id, ranked_candidates):
+    global speculations
+    global global_tx_amt
+    cancel_speculations()
+    if speculation_width <= 0 or executor.is_worker or executor.worker_count() <= 1:
+        return
+
+    for candid in ranked_candidates[0:speculation_width]:
+        next_graph = create_edges(persistent_graph.fork(calculation_graph), [candid[1]], candid[0], False,
+                                  given_src_fee=candid[2])
+        next_candidates = graph_state.get_state(next_graph).candidates(node_id)
+        key = (scripts.graph_fingerprint(next_graph), node_id, global_tx_amt)
+        speculations[key] = {node_candid: executor.submit_speculative_task(
+            fee_weighted_centrality_job, (next_graph, node_id, node_candid, global_tx_amt))
+            for node_candid in next_candidates}
+        speculation_report["started"] += 1
+
+
+"""Function that returns the results of a speculative evaluation (see speculate_next_round) if one was started for
+this graph, and cancels all other speculative evaluations.
+
+:param calculation_graph: A snapshot of the graph object for analysis.
+:param node_id: The source for the edges that need to be created.
+:param node_candidates: The candidate destination ID's.
+:returns: Dictionary mapping the candidates whose speculative evaluation was not cancelled to their (source, 
+destination, fee, reward) tuple, or None if there is no speculative evaluation for this graph.
+"""
+def use_speculation(calculation_graph, node_id, node_candidates):
+    global speculations
+    global global_tx_amt
+    if len(speculations) == 0:
+        return None
+
+    futures = speculations.pop((scripts.graph_fingerprint(calculation_graph), node_id, global_tx_amt), None)
+    cancel_speculations()
+    if futures is None or not set(node_candidates).issubset(futures.keys()):
+        return None
+
+    speculation_report["hits"] += 1
+    return {node_candid: futures[node_candid].result() for node_candid in node_candidates
+            if not futures[node_candid].cancelled()}
+
+
+"""Function that cancels all speculative evaluations that have not been used. Evaluations that are already running 
+finish, but their results are ignored.
+
+:returns: Void.
+"""
+def cancel_speculations():
+    global speculations
+    for futures in speculations.values():
+        for future in futures.values():
+            future.cancel()
+        speculation_report["cancelled"] += 1
+    speculations = {}
+
+
+"""Function that estimates the reward of a new channel for every (source, candidate) pair of a graph at once, instead 
+of one fee_weighted_centrality run per source. The distances and numbers of shortest paths between all pairs of nodes 
+are computed once and shared by all sources. The channel source -> candidate with fee fee takes over the paths of a 
+pair (x, y) when the path x -> source -> candidate -> y is shorter than the current shortest path, and an equal share 
+of the paths when it is just as long. Part of those paths went through the other channels of the source before, the 
+reward the source loses on them is subtracted (see own_pair_rewards). Pairs that start at source are not counted (as in 
+remove_own_betweenness_score). 
+For positive integer fees the estimate is exactly the change of the reward of the source when only the channel source 
+-> candidate is added with fee fee (compute_node_rew). It is a proxy for the placement objective: the channel 
+candidate -> source and the fee optimization of fee_weighted_centrality_job are not included. 
+The matrix takes O(N^2) per (source, candidate) pair, O(N^4) in total for all sources.
+
+:param graph: The graph object.
+:param sources: Optional list of source node ID's, all nodes when it is None.
+:param fee: The fee of the new channels, the most common fee of the tx amount when it is None.
+:returns: Matrix with the estimated reward indexed as [source, candidate] (nan when the pair is already connected or 
+the same node), the list of sources and the list of candidates (all nodes, in graph order).
+"""
+def channel_value_matrix(graph, sources=None, fee=None):
+    global global_tx_amt
+    global tx_most_freq_fees
+    if fee is None:
+        fee = tx_most_freq_fees[global_tx_amt]
+    nodes = list(graph.nodes())
+    if sources is None:
+        sources = nodes
+    node_index = {node: index for index, node in enumerate(nodes)}
+    node_amt = len(nodes)
+    dist_matrix, sigma_matrix = contraction_hierarchy.all_pairs_distances_and_counts(graph, nodes)
+
+    state = graph_state.get_state(graph)
+
+    values = np.full((len(sources), node_amt), np.nan)
+    for row, src_node in enumerate(sources):
+        candidate_index = np.array([node_index[node] for node in state.candidates(src_node)], dtype=int)
+        out_edges = [(node_index[succ], data['weight']) for _, succ, data in graph.out_edges(src_node, data=True)]
+        own_rewards = own_pair_rewards(dist_matrix, sigma_matrix, node_index[src_node], out_edges)
+        values[row, candidate_index] = channel_values(dist_matrix, sigma_matrix, node_index[src_node],
+                                                      candidate_index, fee, own_rewards)
+    return values, list(sources), nodes
+
+
+"""Function that computes the reward a source currently obtains from every pair of nodes, the fees of its channels 
+times the share of the shortest paths of the pair that use them. Pairs that start at the source are not counted.
+
+:param dist_matrix: Matrix with the distance between every pair of nodes.
+:param sigma_matrix: Matrix with the number of shortest paths between every pair of nodes.
+:param src_index: The index of the source.
+:param out_edges: List with the (successor index, fee) of every channel of the source.
+:returns: Matrix with the reward of the source per pair, indexed as [x, y].
+"""
+def own_pair_rewards(dist_matrix, sigma_matrix, src_index, out_edges):
+    connected = np.isfinite(dist_matrix)
+    np.fill_diagonal(connected, False)
+    connected[src_index, :] = False
+
+    own_rewards = np.zeros(dist_matrix.shape)
+    for succ_index, weight in out_edges:
+        through = connected & (dist_matrix[:, src_index][:, None] + weight + dist_matrix[succ_index][None, :] ==
+                               dist_matrix)
+        sources, destinations = np.nonzero(through)
+        own_rewards[sources, destinations] += weight * sigma_matrix[sources, src_index] * \
+            sigma_matrix[succ_index, destinations] / sigma_matrix[sources, destinations]
+    return own_rewards
+
+
+"""Function that estimates the reward of new channels from one source, given the distances and numbers of shortest 
+paths between all pairs of nodes, see channel_value_matrix.
+
+:param dist_matrix: Matrix with the distance between every pair of nodes.
+:param sigma_matrix: Matrix with the number of shortest paths between every pair of nodes.
+:param src_index: The index of the source.
+:param candidate_index: Array with the indices of the candidates.
+:param fee: The fee of the new channels.
+:param own_rewards: Optional matrix with the current reward of the source per pair (see own_pair_rewards), the part 
+of it the new channel takes over is subtracted.
+:returns: Array with the estimated reward of every candidate.
+"""
+def channel_values(dist_matrix, sigma_matrix, src_index, candidate_index, fee, own_rewards=None):
+    node_amt = dist_matrix.shape[0]
+    # Pairs (x, y) that can be taken over: x and y differ, and neither is the source
+    pair_mask = ~np.eye(node_amt, dtype=bool)
+    pair_mask[src_index, :] = False
+    pair_mask[:, src_index] = False
+    block_size = max(1, 2000000 // max(node_amt * node_amt, 1))
+
+    values = np.zeros(len(candidate_index))
+    for start in range(0, len(candidate_index), block_size):
+        block = candidate_index[start:start + block_size]
+        # Length and number of the paths x -> source -> candidate -> y, indexed as [candidate, x, y]
+        new_dist = dist_matrix[:, src_index][None, :, None] + fee + dist_matrix[block, :][:, None, :]
+        new_sigma = sigma_matrix[:, src_index][None, :, None] * sigma_matrix[block, :][:, None, :]
+        shorter = (new_dist < dist_matrix[None, :, :]) & np.isfinite(new_dist)
+        equal = (new_dist == dist_matrix[None, :, :]) & np.isfinite(new_dist)
+
+        share = np.zeros(new_dist.shape)
+        share[shorter] = 1.0
+        share[equal] = new_sigma[equal] / (sigma_matrix[None, :, :] + new_sigma)[equal]
+        values[start:start + len(block)] = fee * np.sum(share * pair_mask[None, :, :], axis=(1, 2))
+        if own_rewards is not None:
+            # The old paths keep the rest of the pair, so the source loses the taken over share of its old reward
+            values[start:start + len(block)] -= np.sum(share * own_rewards[None, :, :], axis=(1, 2))
+    return values
+
+
+"""Function that measures how robust the choice of a new channel is to uncertainty in the fees. samples perturbed 
+versions of the graph are drawn, in which every fee (of the existing edges and of the new channel) is multiplied by a 
+log-normal factor with standard deviation noise and rounded to a whole fee of at least 1. Without noise the fees are 
+used as they are, so every sample equals channel_value_matrix. All candidates are evaluated on the same samples 
+(common random numbers), so the differences between candidates have a low variance. The distances and numbers of 
+shortest paths of all samples are computed in batches (see betweenness.batched_distances_and_counts), and the reward 
+of a candidate is estimated as in channel_value_matrix, the reward taken from the other channels of the source 
+included. 
+The rewards, and therefore the probability of being the best, are those of this estimate at the given fee. It is a 
+proxy for the objective fee_weighted_centrality maximizes: the fee of the new channel is not optimized and the channel 
+candidate -> source is not added, so the ranking can differ from the one of evaluate_edge_candidates.
+
+:param graph: The graph object.
+:param node_id: The source of the new channel.
+:param samples: The number of perturbed fee vectors.
+:param noise: The standard deviation of the logarithm of the perturbation factor.
+:param seed: The seed used to draw the perturbations.
+:param fee: The fee of the new channel, the most common fee of the tx amount when it is None.
+:returns: Dictionary with the candidates, their reward in every sample (matrix indexed as [sample, candidate]), the 
+mean and standard deviation of the rewards, and the probability that each candidate is the best (ties are shared).
+"""
+def fee_uncertainty(graph, node_id, samples=100, noise=0.1, seed=None, fee=None):
+    global global_tx_amt
+    global tx_most_freq_fees
+    if fee is None:
+        fee = tx_most_freq_fees[global_tx_amt]
+    rng = np.random.default_rng(seed)
+    nodes = list(graph.nodes())
+    node_index = {node: index for index, node in enumerate(nodes)}
+    candidates = graph_state.get_state(graph).candidates(node_id)
+    candidate_index = np.array([node_index[node] for node in candidates], dtype=int)
+
+    tails, heads, weights = betweenness.edge_arrays(graph, nodes)
+    # The perturbations are drawn up front, every candidate is evaluated on the same samples
+    factors = np.exp(noise * rng.standard_normal((samples, len(weights) + 1)))
+    if noise > 0:
+        sample_weights = np.maximum(np.round(weights[None, :] * factors[:, :-1]), 1)
+        sample_fees = np.maximum(np.round(fee * factors[:, -1]), 1)
+    else:
+        sample_weights = np.repeat(weights[None, :], samples, axis=0)
+        sample_fees = np.full(samples, fee)
+    src_index = node_index[node_id]
+    own_edges = tails == src_index
+
+    rewards = np.zeros((samples, len(candidates)))
+    batch_size = max(1, 4000000 // max(len(nodes) * max(len(weights), 1), 1))
+    for start in range(0, samples, batch_size):
+        dist, sigma = betweenness.batched_distances_and_counts(tails, heads, sample_weights[start:start + batch_size],
+                                                               len(nodes))
+        for offset in range(dist.shape[0]):
+            out_edges = list(zip(heads[own_edges], sample_weights[start + offset][own_edges]))
+            own_rewards = own_pair_rewards(dist[offset], sigma[offset], src_index, out_edges)
+            rewards[start + offset] = channel_values(dist[offset], sigma[offset], src_index, candidate_index,
+                                                     sample_fees[start + offset], own_rewards)
+
+    is_best = rewards == np.max(rewards, axis=1, keepdims=True) if len(candidates) > 0 else rewards
+    p_best = np.mean(is_best / np.maximum(np.sum(is_best, axis=1, keepdims=True), 1), axis=0)
+    return {"candidates": candidates, "rewards": rewards, "mean": np.mean(rewards, axis=0),
+            "std": np.std(rewards, axis=0), "p_best": p_best}
+
+
+"""Function that calculates the reward a node currently obtains from its outgoing edges.
+
+:param graph: The graph object.
+:param node_id: The node to calculate the reward for.
+:returns: The reward of the node.
+"""
+def node_reward(graph, node_id):
+    between_cent = nx.edge_betweenness_centrality(graph, normalized=False, weight='weight')
+    between_cent = fee_strategies.remove_own_betweenness_score(graph, node_id, between_cent)
+
+    reward = 0
+    for edge in graph.out_edges([node_id], data=True):
+        reward += edge[2]['weight'] * between_cent[(edge[0], edge[1])]
+    return reward
+
+
 """Function to optimize the fee of one edge. This job is used as part of fee_weighted_centrality to allow for multiprocessing.
 
 :param calculation_graph: A snapshot of the graph object for analysis.
@@ -288,7 +715,7 @@ def fee_weighted_centrality_job(graph, node_id, node_candid, global_tx):
     global tx_most_freq_fees
     default_fee = tx_most_freq_fees[global_tx]
 
-    calculation_graph = copy.deepcopy(graph)
+    calculation_graph = persistent_graph.fork(graph)
 
     # Create the candidate edge
     calculation_graph = scripts.add_edge(calculation_graph, node_id, node_candid, default_fee, True)
@@ -315,63 +742,35 @@ reacted.
 :param node_id: The source for the edges that need to be created.
 :param n: The number of edges that need to be created using this strategy.
 :param scenario_dict: scenario_dict is used to determine which analysis to perform. It it meant to have only key that 
-determines the scenario, with the value being the parameter for said scenario.
+determines the scenario, with the value being the parameter for said scenario. The network scenario optionally takes a 
+"radius" key, which bounds the network reaction (see reaction_edges).
+:param beam: If True the reactions are computed with beam_search instead of for every candidate.
+:param beam_width: The maximal number of candidates beam_search computes the reaction for.
+:param bound_factor: Factor of the initial reward that beam_search uses as upper bound of the post-reaction reward.
 :returns: The graph to which edges have been added.
 """
-def game_theory(graph, node_id, n, scenario_dict):
+def game_theory(graph, node_id, n, scenario_dict, beam=False, beam_width=10, bound_factor=1.0):
     global global_tx_amt
     # Create n new edges
     for i in range(n):
-        # Create copy for computation
-        calculation_graph = copy.deepcopy(graph)
-
         # Create new connections list.
-        node_candidates = remove_connected_nodes(calculation_graph.nodes(), calculation_graph.edges(data=True), node_id)
+        node_candidates = graph_state.get_state(graph).candidates(node_id)
 
-        # Init multiprocessing
-        available_cores = psutil.cpu_count(logical=False)
-        pool = multiprocessing.Pool(available_cores - 2)
-        pool_list = []
-        edge_candidates = []
+        # Create copy for computation
+        calculation_graph = persistent_graph.fork(graph)
 
         # Try all possible connections in parallel and store
-        for node_candid in node_candidates:
-            pool_list.append(pool.apply_async(fee_weighted_centrality_job,
-                                              args=(calculation_graph, node_id, node_candid, global_tx_amt)))
-
-        # Wait for the spawned processes to finish
-        pool.close()
-        pool.join()
-
-        # Unpack the value from the processes
-        for pool_res in pool_list:
-            edge_candidates.append(pool_res.get())
-
-        # Close the pool, to allow new jobs to be assigned to the pool object
-        pool.terminate()
+        edge_candidates = evaluate_edge_candidates(calculation_graph, node_id, node_candidates)
 
         # Sort list by reward
         edge_candidates.sort(key=lambda y: y[3], reverse=True)
 
-        # Init multiprocessing
-        game_theory_edge_candidates = []
-
-        scenario_dict_keys = scenario_dict.keys()
-        # Multiprocessing based on the scenario_flag
-        if "network" in scenario_dict_keys:
-            for gt_candid in edge_candidates:
-                game_theory_edge_candidates.append(game_theory_network_job(calculation_graph, gt_candid[0], gt_candid[1], gt_candid[2], gt_candid[3]))
-        elif "party" in scenario_dict_keys:
-            for gt_candid in edge_candidates:
-                scenario_params = scenario_dict["party"]
-                game_theory_edge_candidates.append(game_theory_party_job(calculation_graph, gt_candid[0], gt_candid[1], gt_candid[2], gt_candid[3], scenario_params))
-
-        # Wait for the spawned processes to finish
-        pool.close()
-        pool.join()
-
-        # Close the pool, to allow new jobs to be assigned to the pool object
-        pool.terminate()
+        # Let the network or the other party react to every candidate, all reactions share the same executor
+        if beam:
+            game_theory_edge_candidates = beam_search(calculation_graph, edge_candidates, scenario_dict, beam_width,
+                                                      bound_factor)
+        else:
+            game_theory_edge_candidates = run_reaction_jobs(calculation_graph, edge_candidates, scenario_dict)
 
         # Sort list by reward
         game_theory_edge_candidates.sort(key=lambda y: y[5], reverse=True)
@@ -381,43 +780,291 @@ def game_theory(graph, node_id, n, scenario_dict):
             chosen_candid = game_theory_edge_candidates[0]
             graph = create_edges(graph, [chosen_candid[1]], chosen_candid[0], False, given_src_fee=chosen_candid[2])
             print("Final Game Theory choice ID:", chosen_candid[1], flush=True)
+            speculate_next_round(calculation_graph, node_id, game_theory_edge_candidates)
             return graph, chosen_candid
     return graph, None
 
 
-"""Function to analyse the case that the network will react to the result of our game theoretical choice.
+"""Function that computes the reaction to the candidates of game_theory in order of their initial reward, in batches of 
+one candidate per worker. The post-reaction reward of a candidate is assumed to be at most bound_factor times its 
+initial reward. The search stops as soon as the best post-reaction reward found is at least the bound of all remaining 
+candidates, or when beam_width candidates have been evaluated. The bound is only used to stop while it has held for 
+all evaluated candidates, after a violation only beam_width applies. The bounds and rewards are stored in beam_report.
+
+:param calculation_graph: A snapshot of the graph object for analysis.
+:param edge_candidates: List of (source, destination, fee, reward) tuples, sorted by reward in descending order.
+:param scenario_dict: The scenario_dict of game_theory.
+:param beam_width: The maximal number of candidates to evaluate.
+:param bound_factor: Factor of the initial reward used as upper bound of the post-reaction reward.
+:returns: List with the results of the reaction jobs of the evaluated candidates.
+"""
+def beam_search(calculation_graph, edge_candidates, scenario_dict, beam_width, bound_factor=1.0):
+    global beam_report
+    batch_size = executor.worker_count()
+    results = []
+    best_reward = None
+    bound_holds = True
+    bound_check = []
+    stopped_by = "exhausted"
+
+    while len(results) < len(edge_candidates):
+        # Remaining candidates can not beat the best reward found, the first one has the highest bound
+        if bound_holds and best_reward is not None and best_reward >= edge_candidates[len(results)][3] * bound_factor:
+            stopped_by = "bound"
+            break
+        if len(results) >= beam_width:
+            stopped_by = "beam_width"
+            break
+
+        batch = edge_candidates[len(results):min(len(results) + batch_size, beam_width)]
+        for res in run_reaction_jobs(calculation_graph, batch, scenario_dict):
+            bound = res[3] * bound_factor
+            bound_check.append([bound, res[5], res[5] <= bound])
+            bound_holds = bound_holds and res[5] <= bound
+            results.append(res)
+        best_reward = max(res[5] for res in results)
+
+    beam_report = {"evaluated": len(results), "candidates": len(edge_candidates), "stopped_by": stopped_by,
+                   "bound_check": bound_check}
+    print("Beam search evaluated %s of %s candidates, stopped by %s."
+          % (len(results), len(edge_candidates), stopped_by), flush=True)
+    return results
+
+
+"""Function that computes the reaction to every candidate of game_theory concurrently. The reaction jobs are split into 
+their inner tasks (the optimization of every edge for the network, the evaluation of every candidate of the other party 
+for the party scenario), and the tasks of all candidates are run as one batch on the shared executor. Afterwards the 
+reward of every candidate is computed, again as one batch. The results are equal to running game_theory_network_job or 
+game_theory_party_job for every candidate. Reactions that are in the evaluation cache are not computed again.
+
+:param calculation_graph: A snapshot of the graph object for analysis.
+:param edge_candidates: List of (source, destination, fee, reward) tuples, as returned by fee_weighted_centrality_job.
+:param scenario_dict: The scenario_dict of game_theory.
+:returns: List with the results of the reaction jobs, in the order of edge_candidates.
+"""
+def run_reaction_jobs(calculation_graph, edge_candidates, scenario_dict):
+    global global_tx_amt
+    return evaluation_cache.cached_evaluations(
+        "reaction", calculation_graph, [tuple(candid) for candid in edge_candidates],
+        lambda candidates: compute_reaction_jobs(calculation_graph, candidates, scenario_dict),
+        (sorted(scenario_dict.items()), global_tx_amt))
+
+
+"""Function that computes the reactions of run_reaction_jobs, without using the evaluation cache.
+
+:param calculation_graph: A snapshot of the graph object for analysis.
+:param edge_candidates: List of (source, destination, fee, reward) tuples, as returned by fee_weighted_centrality_job.
+:param scenario_dict: The scenario_dict of game_theory.
+:returns: List with the results of the reaction jobs, in the order of edge_candidates.
+"""
+def compute_reaction_jobs(calculation_graph, edge_candidates, scenario_dict):
+    global global_tx_amt
+    reaction_graphs = [reaction_graph(calculation_graph, candid[0], candid[1], candid[2]) for candid in edge_candidates]
+
+    task_list = []
+    task_amounts = []
+    if "network" in scenario_dict.keys():
+        inner_job = fee_strategies.graph_fee_optimization_job
+        finish_job = network_reaction_reward
+        # With a radius only the edges near the candidate edge, or whose usage changes, react (see reaction_edges)
+        radius = scenario_dict.get("radius")
+        if radius is None:
+            edge_lists = [list(candid_graph.edges(data=True)) for candid_graph in reaction_graphs]
+        else:
+            base_betweenness = nx.edge_betweenness_centrality(calculation_graph, normalized=False, weight='weight')
+            edge_lists = executor.run_tasks(reaction_edges,
+                                            [(candid_graph, candid[0], candid[1], radius, base_betweenness)
+                                             for candid, candid_graph in zip(edge_candidates, reaction_graphs)])
+        for candid_graph, edge_list in zip(reaction_graphs, edge_lists):
+            task_list += [(edge, candid_graph) for edge in edge_list]
+            task_amounts.append(len(edge_list))
+    elif "party" in scenario_dict.keys():
+        other_node_id = scenario_dict["party"][0]
+        inner_job = fee_weighted_centrality_job
+        finish_job = party_reaction_reward
+        for candid_graph in reaction_graphs:
+            other_candidates = graph_state.get_state(candid_graph).candidates(other_node_id)
+            task_list += [(candid_graph, other_node_id, other_candid, global_tx_amt) for other_candid in other_candidates]
+            task_amounts.append(len(other_candidates))
+    else:
+        return []
+
+    task_results = executor.run_tasks(inner_job, task_list)
+
+    finish_list = []
+    task_index = 0
+    for candid, candid_graph, task_amount in zip(edge_candidates, reaction_graphs, task_amounts):
+        finish_list.append((candid_graph, task_results[task_index:task_index + task_amount],
+                            candid[0], candid[1], candid[2], candid[3]))
+        task_index += task_amount
+    return executor.run_tasks(finish_job, finish_list)
+
+
+"""Function that selects the edges that react to a candidate edge in the bounded network reaction model. These are the 
+edges that have an end point within radius hops (in either direction) of the candidate edge, and the edges whose 
+number of shortest paths changed by placing the candidate edge. All other edges keep their fee.
+
+:param graph: The graph containing the candidate edge.
+:param source: Source ID of the candidate edge.
+:param dest: Destination ID of the candidate edge.
+:param radius: The number of hops, 0 only selects the edges of source and dest.
+:param base_betweenness: Optional edge betweenness (nx, normalized=False) of the graph before the candidate edge was 
+placed. If it is None the usage of edges is not checked.
+:returns: List of (source, destination, data) tuples, in the order of graph.edges.
+"""
+def reaction_edges(graph, source, dest, radius, base_betweenness=None):
+    undirected_graph = graph.to_undirected(as_view=True)
+    nearby_nodes = set(nx.single_source_shortest_path_length(undirected_graph, source, cutoff=radius).keys())
+    nearby_nodes.update(nx.single_source_shortest_path_length(undirected_graph, dest, cutoff=radius).keys())
+
+    between_cent = None
+    if base_betweenness is not None:
+        between_cent = nx.edge_betweenness_centrality(graph, normalized=False, weight='weight')
+
+    edge_list = []
+    for edge in graph.edges(data=True):
+        if edge[0] in nearby_nodes or edge[1] in nearby_nodes:
+            edge_list.append(edge)
+        elif between_cent is not None and np.abs(between_cent[(edge[0], edge[1])] -
+                                                 base_betweenness.get((edge[0], edge[1]), 0.0)) >= 0.0001:
+            edge_list.append(edge)
+    return edge_list
+
+
+"""Function that compares the bounded network reaction model (see reaction_edges) with the full network reaction, in 
+which every edge of the graph reacts. Both models are run for a random sample of the candidates, and the results are
+stored in reaction_model_report.
+
+:param graph: The graph object for analysis.
+:param edge_candidates: List of (source, destination, fee, reward) tuples, as returned by fee_weighted_centrality_job.
+:param radius: The radius of the bounded model.
+:param sample_size: The number of candidates to compare.
+:param seed: The seed used to sample the candidates.
+:returns: The report, containing [destination, full reward, bounded reward, difference, reacting edges] for every 
+sampled candidate, the number of edges of the graph, and the largest and mean absolute difference.
+"""
+def compare_reaction_models(graph, edge_candidates, radius, sample_size, seed=None):
+    global reaction_model_report
+    rng = np.random.default_rng(seed)
+    sample_size = min(sample_size, len(edge_candidates))
+    sample = [edge_candidates[index] for index in sorted(rng.choice(len(edge_candidates), sample_size, replace=False))]
+
+    full_res = run_reaction_jobs(graph, sample, {"network": 'x'})
+    bounded_res = run_reaction_jobs(graph, sample, {"network": 'x', "radius": radius})
+    base_betweenness = nx.edge_betweenness_centrality(graph, normalized=False, weight='weight')
+
+    comparison = []
+    for candid, full, bounded in zip(sample, full_res, bounded_res):
+        edge_amt = len(reaction_edges(reaction_graph(graph, candid[0], candid[1], candid[2]), candid[0], candid[1],
+                                      radius, base_betweenness))
+        comparison.append([candid[1], full[5], bounded[5], bounded[5] - full[5], edge_amt])
+        print("Reaction models for %s -> %s: full %s, radius %s %s (%s edges)"
+              % (candid[0], candid[1], full[5], radius, bounded[5], edge_amt), flush=True)
+
+    differences = [np.abs(entry[3]) for entry in comparison]
+    reaction_model_report = {"radius": radius, "edges": graph.number_of_edges(), "candidates": comparison,
+                             "max_difference": float(max(differences, default=0.0)),
+                             "mean_difference": float(np.mean(differences)) if len(differences) > 0 else 0.0}
+    return reaction_model_report
+
+
+"""Function that creates the graph in which a candidate edge of game_theory has been placed.
 
 :param graph: The graph object for analysis.
 :param source: Source ID.
 :param dest: Destination ID.
-:param fee: The fee to be analysed.
-:param initial_reward: The initial rewards when using fee=fee
-:returns: Object containing the resulting hypothetical reward.
+:param fee: The fee of the candidate edge.
+:returns: A copy of the graph that contains the candidate edge.
 """
-def game_theory_network_job(graph, source, dest, fee, initial_reward):
-    calculation_graph = copy.deepcopy(graph)
-
-    # Create the candidate edge
+def reaction_graph(graph, source, dest, fee):
+    calculation_graph = persistent_graph.fork(graph)
     calculation_graph = create_edges(calculation_graph, [dest], source, False, given_src_fee=fee)
+    return calculation_graph
 
-    # Update network fees
-    calculation_graph = fee_strategies.graph_fee_optimization(calculation_graph)
 
+"""Function that computes the reward of a candidate edge after the reaction has been applied to the graph.
+
+:param calculation_graph: The graph containing the candidate edge and the reaction.
+:param source: Source ID.
+:param dest: Destination ID.
+:param fee: The fee the candidate edge was placed with.
+:param initial_reward: The initial rewards when using fee=fee
+:returns: Object containing the resulting hypothetical reward.
+"""
+def reaction_reward(calculation_graph, source, dest, fee, initial_reward):
     # Get the edge object for our analysis
     observing_edge = scripts.get_edge(calculation_graph, source, dest)
     new_fee = observing_edge[2]['weight']
 
-    # Compute the reward that our observing edge brings in after the network update
+    # Compute the reward that our observing edge brings in after the reaction
     edge_rew, rest_rew = fee_strategies.compute_node_rew(new_fee, calculation_graph, observing_edge)
     reward = edge_rew + rest_rew
 
-    # Remove the candidate edge
-    calculation_graph = scripts.remove_edge(calculation_graph, source, dest)
-
     res = (source, dest, fee, initial_reward, new_fee, reward)
     return res
 
 
+"""Function that applies the network reaction (the result of graph_fee_optimization_job for every edge) to a graph
+and computes the reward of the candidate edge, used as part of run_reaction_jobs.
+
+:param calculation_graph: The graph containing the candidate edge.
+:param new_edges: List of (source, destination, fee) tuples with the optimized fees.
+:param source: Source ID.
+:param dest: Destination ID.
+:param fee: The fee the candidate edge was placed with.
+:param initial_reward: The initial rewards when using fee=fee
+:returns: Object containing the resulting hypothetical reward.
+"""
+def network_reaction_reward(calculation_graph, new_edges, source, dest, fee, initial_reward):
+    for edge in new_edges:
+        calculation_graph = scripts.add_edge(calculation_graph, edge[0], edge[1], edge[2], False)
+    return reaction_reward(calculation_graph, source, dest, fee, initial_reward)
+
+
+"""Function that places the best edge of the other party (given the result of fee_weighted_centrality_job for all of 
+its candidates) and computes the reward of the candidate edge, used as part of run_reaction_jobs.
+
+:param calculation_graph: The graph containing the candidate edge.
+:param other_candidates: List of (source, destination, fee, reward) tuples of the other party.
+:param source: Source ID.
+:param dest: Destination ID.
+:param fee: The fee the candidate edge was placed with.
+:param initial_reward: The initial rewards when using fee=fee
+:returns: Object containing the resulting hypothetical reward.
+"""
+def party_reaction_reward(calculation_graph, other_candidates, source, dest, fee, initial_reward):
+    other_candidates = sorted(other_candidates, key=lambda y: y[3], reverse=True)
+    if len(other_candidates) > 0:
+        chosen_candid = other_candidates[0]
+        calculation_graph = create_edges(calculation_graph, [chosen_candid[1]], chosen_candid[0], False,
+                                         given_src_fee=chosen_candid[2])
+    return reaction_reward(calculation_graph, source, dest, fee, initial_reward)
+
+
+"""Function to analyse the case that the network will react to the result of our game theoretical choice.
+
+:param graph: The graph object for analysis.
+:param source: Source ID.
+:param dest: Destination ID.
+:param fee: The fee to be analysed.
+:param initial_reward: The initial rewards when using fee=fee
+:param radius: Optional radius of the bounded reaction model (see reaction_edges), None lets every edge react.
+:returns: Object containing the resulting hypothetical reward.
+"""
+def game_theory_network_job(graph, source, dest, fee, initial_reward, radius=None):
+    # Create the candidate edge
+    calculation_graph = reaction_graph(graph, source, dest, fee)
+
+    # Update network fees
+    edge_list = None
+    if radius is not None:
+        base_betweenness = nx.edge_betweenness_centrality(graph, normalized=False, weight='weight')
+        edge_list = reaction_edges(calculation_graph, source, dest, radius, base_betweenness)
+    calculation_graph = fee_strategies.graph_fee_optimization(calculation_graph, edge_list)
+
+    return reaction_reward(calculation_graph, source, dest, fee, initial_reward)
+
+
 """Function to analyse the case that the other parties will react to the result of our game theoretical choice.
 
 :param graph: The graph object for analysis.
@@ -429,25 +1076,244 @@ def game_theory_network_job(graph, source, dest, fee, initial_reward):
 :returns: Object containing the resulting hypothetical reward.
 """
 def game_theory_party_job(graph, source, dest, fee, initial_reward, scenario_params):
-    calculation_graph = copy.deepcopy(graph)
-
     # Create the candidate edge
-    calculation_graph = create_edges(calculation_graph, [dest], source, False, given_src_fee=fee)
+    calculation_graph = reaction_graph(graph, source, dest, fee)
 
     # Other party adds their edge
     other_node_id = scenario_params[0]
     calculation_graph = fee_weighted_centrality(calculation_graph, other_node_id, 1)
 
-    # Get the edge object for our analysis
-    observing_edge = scripts.get_edge(calculation_graph, source, dest)
-    new_fee = observing_edge[2]['weight']
+    return reaction_reward(calculation_graph, source, dest, fee, initial_reward)
 
-    # Compute the reward that our observing edge brings in after the network update
-    edge_rew, rest_rew = fee_strategies.compute_node_rew(new_fee, calculation_graph, observing_edge)
-    reward = edge_rew + rest_rew
 
-    # Remove the candidate edge
-    calculation_graph = scripts.remove_edge(calculation_graph, source, dest)
+"""Function for determining how to create new edges connecting a node further to the graph, looking multiple moves 
+ahead. A move consists of placing one of our edges after which the other party places its best edge (as in 
+game_theory_party_job). The sequence of depth moves that ends with the highest reward is searched for, and its first 
+edge is placed. 
+At every move only the width candidates with the highest initial reward are tried. A candidate is pruned when its bound 
+can not beat the best sequence found so far among its siblings. The bound assumes diminishing returns: the reward is at 
+most bound_factor times the initial reward of the candidate, plus the largest gain of this move for every move that 
+follows. Graphs that are reached by different move orders are only searched once, using a transposition table keyed by 
+scripts.graph_fingerprint together with the parameters of the search.
 
-    res = (source, dest, fee, initial_reward, new_fee, reward)
-    return res
+:param graph: The graph object one wishes to add an edge to.
+:param node_id: The source for the edges that need to be created.
+:param n: The number of edges that need to be created using this strategy.
+:param scenario_dict: Dict with the key "party", with as value a list whose first element is the ID of the other party.
+:param depth: The number of moves to look ahead.
+:param width: The number of candidates that are tried at every move.
+:param bound_factor: Factor of the initial reward used in the bound of a candidate, None disables the pruning.
+:param transposition_table: Optional dict to reuse the searched graphs across calls.
+:returns: The graph to which edges have been added, and the chosen candidate as (source, destination, fee, initial 
+reward, fee, reward at the end of the sequence).
+"""
+def game_theory_lookahead(graph, node_id, n, scenario_dict, depth=2, width=3, bound_factor=1.0,
+                          transposition_table=None):
+    global lookahead_report
+    other_node_id = scenario_dict["party"][0]
+    if transposition_table is None:
+        transposition_table = {}
+    lookahead_report = {"searched": 0, "table_hits": 0, "pruned": 0}
+
+    chosen_candid = None
+    for i in range(n):
+        value, moves, _ = lookahead_search(graph, node_id, other_node_id, depth, width, bound_factor,
+                                           transposition_table)
+        if len(moves) == 0:
+            break
+
+        candid = moves[0]
+        chosen_candid = (candid[0], candid[1], candid[2], candid[3], candid[2], value)
+        graph = create_edges(graph, [candid[1]], candid[0], False, given_src_fee=candid[2])
+        print("Final Game Theory lookahead choice ID: %s, sequence: %s, reward: %s"
+              % (candid[1], [move[1] for move in moves], value), flush=True)
+
+    lookahead_report["moves"] = [] if chosen_candid is None else [move[1] for move in moves]
+    return graph, chosen_candid
+
+
+"""Function that searches the best sequence of moves for game_theory_lookahead.
+
+:param graph: The graph object for analysis.
+:param node_id: Our node ID.
+:param other_node_id: The ID of the other party.
+:param depth: The number of moves left.
+:param width: The number of candidates that are tried at every move.
+:param bound_factor: Factor of the initial reward used in the bound of a candidate, None disables the pruning.
+:param transposition_table: Dict mapping (graph fingerprint, depth, width, node_id, other_node_id, tx amount, most 
+frequent fee, bound_factor) to the result of this function. Results without any pruning in their search are exact, they are also stored with bound_factor 
+None so searches with any bound_factor can reuse them.
+:returns: The reward of our node at the end of the best sequence, the sequence as a list of (source, destination, fee, 
+reward) tuples of our edges, and a boolean that is False when candidates were pruned, making the reward a lower bound.
+"""
+def lookahead_search(graph, node_id, other_node_id, depth, width, bound_factor, transposition_table):
+    global lookahead_report
+    global global_tx_amt
+    key = (scripts.graph_fingerprint(graph), depth, width, node_id, other_node_id, global_tx_amt,
+           fee_strategies.most_freq_fee)
+    for factor in [bound_factor, None]:
+        if key + (factor,) in transposition_table:
+            lookahead_report["table_hits"] += 1
+            return transposition_table[key + (factor,)]
+    lookahead_report["searched"] += 1
+
+    base_reward = node_reward(graph, node_id)
+    best = (base_reward, [])
+    exact = True
+    if depth > 0:
+        node_candidates = graph_state.get_state(graph).candidates(node_id)
+        edge_candidates = evaluate_edge_candidates(graph, node_id, node_candidates)
+        edge_candidates.sort(key=lambda y: y[3], reverse=True)
+        edge_candidates = edge_candidates[0:width]
+        max_gain = max([candid[3] - base_reward for candid in edge_candidates] + [0])
+
+        best = (None, [])
+        for index, candid in enumerate(edge_candidates):
+            # Candidates are sorted by initial reward, so all remaining candidates have a lower bound
+            if bound_factor is not None and best[0] is not None and \
+                    best[0] >= candid[3] * bound_factor + (depth - 1) * max_gain:
+                lookahead_report["pruned"] += len(edge_candidates) - index
+                exact = False
+                break
+
+            # Our move followed by the best response of the other party
+            move_graph = reaction_graph(graph, candid[0], candid[1], candid[2])
+            if other_node_id in move_graph:
+                move_graph = fee_weighted_centrality(move_graph, other_node_id, 1)
+            value, moves, move_exact = lookahead_search(move_graph, node_id, other_node_id, depth - 1, width,
+                                                        bound_factor, transposition_table)
+            exact = exact and move_exact
+            if best[0] is None or value > best[0]:
+                best = (value, [candid] + moves)
+
+        if best[0] is None:
+            best = (base_reward, [])
+
+    result = (best[0], best[1], exact)
+    transposition_table[key + (bound_factor,)] = result
+    if exact:
+        transposition_table[key + (None,)] = result
+    return result
+
+
+"""Function for placing one edge for every party at the same time, using the fee weighted centrality strategy. All 
+parties compute their best response against the same snapshot of the graph, and the evaluations of all parties are run 
+as one batch on the shared executor. Two parties that pick the same channel (each other) are in conflict, conflicts are 
+resolved in the order of party_ids: the first party keeps the channel, the later party gets its next best candidate.
+With fixed_point every party then recomputes its best response against the graph containing the edges of all other 
+parties, until no party changes its choice or max_iterations is reached.
+
+:param graph: The graph object one wishes to add the edges to.
+:param party_ids: The ID's of the parties that place an edge, in the order used to resolve conflicts.
+:param fixed_point: Boolean that indicates if the best responses should be iterated to a fixed point.
+:param max_iterations: The maximal number of rounds of best responses when fixed_point is set.
+:returns: The graph to which edges have been added, and a dict with the chosen (source, destination, fee, reward) of
+every party (None if a party has no candidates).
+"""
+def simultaneous_best_responses(graph, party_ids, fixed_point=False, max_iterations=10):
+    global simultaneous_report
+    calculation_graph = persistent_graph.fork(graph)
+    choices = {party_id: None for party_id in party_ids}
+    iterations = 0
+    converged = False
+    conflicts = 0
+
+    while not converged and iterations < max(max_iterations, 1):
+        # Every party responds to the snapshot with the (previous) edges of all other parties
+        party_graphs = []
+        for party_id in party_ids:
+            party_graph = calculation_graph
+            if iterations > 0:
+                party_graph = persistent_graph.fork(calculation_graph)
+                for other_id, candid in choices.items():
+                    if other_id != party_id and candid is not None:
+                        party_graph = create_edges(party_graph, [candid[1]], candid[0], False,
+                                                   given_src_fee=candid[2])
+            party_graphs.append(party_graph)
+
+        rankings = party_rankings(party_graphs, party_ids)
+        new_choices, round_conflicts = resolve_conflicts(party_ids, rankings)
+        conflicts += round_conflicts
+        iterations += 1
+
+        converged = same_choices(new_choices, choices)
+        choices = new_choices
+        if not fixed_point:
+            break
+
+    for party_id in party_ids:
+        candid = choices[party_id]
+        if candid is not None:
+            graph = create_edges(graph, [candid[1]], candid[0], False, given_src_fee=candid[2])
+            print("Simultaneous choice %s -> %s, fee: %s, reward: %s" % candid, flush=True)
+
+    simultaneous_report = {"iterations": iterations, "converged": converged, "conflicts": conflicts}
+    return graph, choices
+
+
+"""Function that checks if the parties chose the same channels in two rounds of simultaneous_best_responses. Only the 
+source, destination and fee are compared, the rewards can differ in the last bits between rounds.
+
+:param choices: Dict with the chosen (source, destination, fee, reward) of every party, None if it has no candidates.
+:param other_choices: Dict with the choices of the other round.
+:returns: Boolean indicating whether every party chose the same channel with the same fee.
+"""
+def same_choices(choices, other_choices):
+    for party_id, candid in choices.items():
+        other_candid = other_choices.get(party_id)
+        if (candid is None) != (other_candid is None):
+            return False
+        if candid is not None and candid[0:3] != other_candid[0:3]:
+            return False
+    return len(choices) == len(other_choices)
+
+
+"""Function that evaluates the candidates of every party as a single batch on the shared executor, used as part of
+simultaneous_best_responses.
+
+:param party_graphs: The graph every party computes its response against.
+:param party_ids: The ID's of the parties.
+:returns: List with for every party its (source, destination, fee, reward) tuples, sorted by reward.
+"""
+def party_rankings(party_graphs, party_ids):
+    global global_tx_amt
+    task_list = []
+    task_amounts = []
+    for party_graph, party_id in zip(party_graphs, party_ids):
+        node_candidates = graph_state.get_state(party_graph).candidates(party_id)
+        task_list += [(party_graph, party_id, node_candid, global_tx_amt) for node_candid in node_candidates]
+        task_amounts.append(len(node_candidates))
+
+    task_results = executor.run_tasks(fee_weighted_centrality_job, task_list)
+
+    rankings = []
+    task_index = 0
+    for task_amount in task_amounts:
+        ranking = task_results[task_index:task_index + task_amount]
+        ranking.sort(key=lambda y: y[3], reverse=True)
+        rankings.append(ranking)
+        task_index += task_amount
+    return rankings
+
+
+"""Function that picks the best candidate of every party such that no two parties create the same channel, the parties 
+pick in the order of party_ids.
+
+:param party_ids: The ID's of the parties.
+:param rankings: List with for every party its (source, destination, fee, reward) tuples, sorted by reward.
+:returns: Dict with the chosen candidate of every party (None if there is none left), and the number of conflicts.
+"""
+def resolve_conflicts(party_ids, rankings):
+    choices = {}
+    claimed = set()
+    conflicts = 0
+    for party_id, ranking in zip(party_ids, rankings):
+        choices[party_id] = None
+        for candid in ranking:
+            if frozenset((candid[0], candid[1])) in claimed:
+                conflicts += 1
+                continue
+            choices[party_id] = candid
+            claimed.add(frozenset((candid[0], candid[1])))
+            break
+    return choices, conflicts
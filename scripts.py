@@ -1,10 +1,25 @@
 import networkx as nx
 import json
+import hashlib
 import matplotlib.pyplot as plt
 import fee_strategies
 import placement_strategies
+import graph_state
+import betweenness
+import contraction_hierarchy
+import persistent_graph
+import executor
+import math
 import numpy as np
 
+# Nodes of which calc_node_profit computes the rewards right away, None computes the rewards of every node. The other
+# nodes get None as reward, together with a snapshot of the graph in pending_rewards so fill_rewards can compute them.
+tracked_nodes = None
+pending_rewards = []
+# When True, calc_node_profit also records which sources pay the rewards of the nodes, one attribution per call
+record_attribution = False
+attributions = []
+
 """Function that load the data from json from filepath.
 
 :param filepath: The filepath from the root directory one wishes to load the json from.
@@ -39,10 +54,8 @@ def write_json(data, file_path):
 """
 def get_edge(graph, src_node, dest_node):
     try:
-        edge_list = graph.out_edges([src_node], data=True)
-        for search_candid in edge_list:
-            if dest_node == search_candid[1]:
-                return search_candid
+        if graph.has_edge(src_node, dest_node):
+            return src_node, dest_node, graph[src_node][dest_node]
         return -1
     except:
         print("When attempting to obtain the edge %s -> %s, the search returned an error" % (src_node, dest_node))
@@ -58,6 +71,7 @@ def get_edge(graph, src_node, dest_node):
 """
 def add_edge(graph, node1, node2, weight, needs_optimization):
     graph.add_edge(node1, node2, weight=weight)
+    graph_state.edge_added(graph, node1, node2)
     if needs_optimization:
         edge = get_edge(graph, node1, node2)
         graph = fee_strategies.edge_fee_optimization(graph, edge)
@@ -73,7 +87,9 @@ def add_edge(graph, node1, node2, weight, needs_optimization):
 """
 def remove_edge(graph, node1, node2):
     graph.remove_edge(node1, node2)
+    graph_state.edge_removed(graph, node1, node2)
     graph.remove_edge(node2, node1)
+    graph_state.edge_removed(graph, node2, node1)
     return graph
 
 
@@ -83,11 +99,25 @@ def remove_edge(graph, node1, node2):
 :returns: The graph to which a node has been added.
 """
 def add_node(graph):
-    new_node_id = str(int(list(graph.nodes())[-1]) + 1)
+    state = graph_state.get_state(graph)
+    new_node_id = state.next_node_id()
     graph.add_node(new_node_id)
+    state.add_node(new_node_id)
     return graph, new_node_id
 
 
+"""Function that computes a fingerprint of a graph, which is equal for graphs with the same nodes and the same edges 
+with the same fees, regardless of the order in which they were added.
+
+:param graph: The graph object.
+:returns: The fingerprint as a hexadecimal string.
+"""
+def graph_fingerprint(graph):
+    nodes = sorted(str(node) for node in graph.nodes())
+    edges = sorted((str(src), str(dst), repr(float(data['weight']))) for src, dst, data in graph.edges(data=True))
+    return hashlib.sha256(repr((nodes, edges)).encode("utf8")).hexdigest()
+
+
 """Function that initializes a dictionary that keeps track of the reward each nodes has obtained.
 The keys are the nodes, with the value being a list of rewards to keep track of rewards over time.
 
@@ -108,19 +138,40 @@ reward that corresponds to the given graph.
 
 :param graph: The graph object one wishes to calculate the rewards over.
 :param prev_rewards: The reward dictionary one wishes to add the rewards to.
+:param engine: Optional betweenness.IncrementalBetweenness that follows the graph across rounds, only the shortest path 
+trees affected by the changes since the previous call are then recomputed.
+:param parallel: Boolean that indicates if the sources should be divided over the workers of the shared executor, see 
+calc_node_profit_parallel. Graphs with fees of 0, and calls that record the attribution, are computed serially.
 :returns: The updated reward dictionary.
 """
-def calc_node_profit(graph, prev_rewards):
+def calc_node_profit(graph, prev_rewards, engine=None, parallel=False):
+    # The tracked rewards compare sums of distances, which is only exact for positive integer fees
+    if tracked_nodes is not None and betweenness.has_positive_integer_fees(graph):
+        return calc_tracked_node_profit(graph, prev_rewards)
+    # With fees of 0 the own transactions are only removed correctly from the enumerated paths, see has_zero_fee
+    zero_fee = betweenness.has_zero_fee(graph)
+    if parallel and engine is None and not record_attribution and not zero_fee:
+        return calc_node_profit_parallel(graph, prev_rewards)
     is_only_reroute = True
 
     for node in graph.nodes():
         prev_rewards[node].append(0)
 
-    between_cent = nx.edge_betweenness_centrality(graph, normalized=False, weight='weight')
-    if is_only_reroute:
-        for node in list(graph.nodes()):
-            src_node = node
-            between_cent = fee_strategies.remove_own_betweenness_score(graph, src_node, between_cent)
+    if engine is not None and not (is_only_reroute and zero_fee):
+        engine.update(graph)
+        between_cent = engine.reroute_edge_betweenness() if is_only_reroute else engine.edge_betweenness()
+    elif is_only_reroute and betweenness.block_decomposition and not record_attribution and not zero_fee:
+        between_cent = betweenness.reroute_edge_betweenness(graph)
+    else:
+        if record_attribution:
+            between_cent, attribution = betweenness.edge_betweenness_with_attribution(graph)
+            attributions.append(attribution)
+        else:
+            between_cent = nx.edge_betweenness_centrality(graph, normalized=False, weight='weight')
+        if is_only_reroute:
+            for node in list(graph.nodes()):
+                src_node = node
+                between_cent = fee_strategies.remove_own_betweenness_score(graph, src_node, between_cent)
     for edge in graph.edges(data=True):
         weight = edge[2]['weight']
         freq_key = (edge[0], edge[1])
@@ -129,6 +180,189 @@ def calc_node_profit(graph, prev_rewards):
     return prev_rewards
 
 
+"""Function that computes the part of calc_node_profit_parallel that belongs to a shard of sources. For every source 
+this is its contribution to the betweenness of its block and the dependency of the edges leaving it on itself, see 
+betweenness.block_source_dependencies.
+
+:param block_graphs: The graphs of the blocks.
+:param multiplicities: Dictionary per block mapping its nodes to the number of nodes they represent.
+:param shard: List of (block index, source) tuples.
+:returns: List with per source the block index, an array with the contribution to every edge of the block (in the order 
+of its edges) and the dictionary with the dependency of the edges leaving the source on the source itself.
+"""
+def profit_shard_job(block_graphs, multiplicities, shard):
+    edge_indices = {}
+    adjacencies = {}
+    results = []
+    for block_index, src_node in shard:
+        block_graph = block_graphs[block_index]
+        if block_index not in edge_indices:
+            edge_indices[block_index] = {edge: index for index, edge in enumerate(block_graph.edges())}
+            adjacencies[block_index] = betweenness.grouped_adjacency(block_graph)
+        edge_index = edge_indices[block_index]
+
+        edge_dependency, own_dependency = betweenness.block_source_dependencies(
+            block_graph, multiplicities[block_index], src_node, adjacencies[block_index])
+        contributions = np.zeros(len(edge_index))
+        for edge, dependency in edge_dependency.items():
+            contributions[edge_index[edge]] = dependency
+        results.append((block_index, contributions, own_dependency))
+    return results
+
+
+"""Function that calculates the same rewards as calc_node_profit, with the sources divided over the workers of the 
+shared executor. The betweenness is computed as betweenness.reroute_edge_betweenness does, per block when 
+betweenness.block_decomposition is set and on the whole graph otherwise. The shards are contiguous ranges of the 
+(block, source) pairs, and their results are combined in the order of the sources with the same operations, so the 
+rewards are equal bit for bit to those of the serial version with block_decomposition set. Without it they differ from 
+the enumerated paths of remove_own_betweenness_score only by rounding.
+
+:param graph: The graph object one wishes to calculate the rewards over.
+:param prev_rewards: The reward dictionary one wishes to add the rewards to.
+:returns: The updated reward dictionary.
+"""
+def calc_node_profit_parallel(graph, prev_rewards):
+    for node in graph.nodes():
+        prev_rewards[node].append(0)
+
+    if betweenness.block_decomposition:
+        blocks, multiplicities = betweenness.reroute_blocks(graph)
+    else:
+        blocks, multiplicities = [set(graph.nodes())], [dict.fromkeys(graph.nodes(), 1)]
+    block_graphs = [betweenness.block_subgraph(graph, block) for block in blocks]
+    pairs = [(block_index, src_node) for block_index, block_graph in enumerate(block_graphs)
+             for src_node in block_graph.nodes()]
+
+    # More shards than workers, so a shard with expensive sources does not keep the other workers waiting
+    shard_size = max(1, math.ceil(len(pairs) / (4 * executor.worker_count())))
+    shards = [pairs[index:index + shard_size] for index in range(0, len(pairs), shard_size)]
+    results = executor.run_tasks(profit_shard_job, [(block_graphs, multiplicities, shard) for shard in shards])
+
+    # The contributions are added one source after the other, like the serial version does
+    totals = [np.zeros(block_graph.number_of_edges()) for block_graph in block_graphs]
+    own_dependency = {}
+    for shard_results in results:
+        for block_index, contributions, source_own_dependency in shard_results:
+            totals[block_index] += contributions
+            own_dependency.update(source_own_dependency)
+
+    between_cent = {}
+    for block_graph, block_totals in zip(block_graphs, totals):
+        for index, edge in enumerate(block_graph.edges()):
+            value = float(block_totals[index]) - own_dependency.get(edge, 0.0)
+            between_cent[edge] = 0.0 if np.abs(value) < 0.0001 else value
+
+    for edge in graph.edges(data=True):
+        prev_rewards[edge[0]][-1] += between_cent[(edge[0], edge[1])] * edge[2]['weight']
+    return prev_rewards
+
+
+"""Function that enables (or disables) recording which sources pay the rewards of the nodes in calc_node_profit, see 
+betweenness.edge_betweenness_with_attribution. It is recorded when calc_node_profit computes the betweenness itself, 
+so not when an engine or tracked nodes are used. The parallel mode computes serially while it is recorded.
+
+:param enabled: Boolean that indicates if the attribution should be recorded, enabling it clears the attributions.
+:returns: Void.
+"""
+def set_attribution(enabled):
+    global record_attribution
+    global attributions
+    record_attribution = enabled
+    if enabled:
+        attributions = []
+
+
+"""Function that writes the recorded attributions to a compressed numpy file, with one entry per (call, source, owner).
+
+:param file_path: The path of the .npz file.
+:returns: Void.
+"""
+def save_attributions(file_path):
+    rounds = [np.zeros(0, dtype=int)]
+    sources = [np.zeros(0, dtype=str)]
+    owners = [np.zeros(0, dtype=str)]
+    amounts = [np.zeros(0)]
+    for index, (source, owner, amount) in enumerate(attributions):
+        rounds.append(np.full(len(source), index))
+        sources.append(source)
+        owners.append(owner)
+        amounts.append(amount)
+    np.savez_compressed(file_path, round=np.concatenate(rounds), source=np.concatenate(sources),
+                        owner=np.concatenate(owners), amount=np.concatenate(amounts))
+
+
+"""Function that sets the nodes of which calc_node_profit computes the rewards right away, such as our party and the 
+other parties that are plotted. The rewards of the other nodes are only computed by fill_rewards.
+
+:param nodes: The node ID's, None to compute the rewards of every node again.
+:returns: Void.
+"""
+def set_tracked_nodes(nodes):
+    global tracked_nodes
+    tracked_nodes = None if nodes is None else list(nodes)
+
+
+"""Function that calculates the rewards of the tracked nodes only, see calc_node_profit. The reward of a node is 
+computed from the shortest paths towards it and the shortest paths from its neighbours, instead of from the 
+betweenness of every edge. The other nodes get None as reward.
+The graph needs positive integer fees (see betweenness.has_positive_integer_fees), calc_node_profit computes the 
+rewards of every node for other graphs.
+
+:param graph: The graph object one wishes to calculate the rewards over.
+:param prev_rewards: The reward dictionary one wishes to add the rewards to.
+:returns: The updated reward dictionary.
+"""
+def calc_tracked_node_profit(graph, prev_rewards):
+    for node in graph.nodes():
+        prev_rewards[node].append(None)
+
+    nodes = list(graph.nodes())
+    node_index = {node: index for index, node in enumerate(nodes)}
+    dist_matrix, sigma_matrix = contraction_hierarchy.all_pairs_distances_and_counts(graph, nodes)
+    for node in tracked_nodes:
+        prev_rewards[node][-1] = betweenness.reroute_node_reward(graph, node, dist_matrix, sigma_matrix, node_index)
+
+    if any(node not in tracked_nodes for node in nodes):
+        pending_rewards.append((prev_rewards, len(prev_rewards[nodes[0]]) - 1, persistent_graph.fork(graph)))
+    return prev_rewards
+
+
+"""Function that computes the rewards that calc_node_profit left out because the nodes were not tracked, from the 
+snapshots of the graphs it stored.
+
+:param rewards: The reward dictionary.
+:returns: The reward dictionary, without None rewards.
+"""
+def fill_rewards(rewards):
+    global pending_rewards
+    remaining = []
+    for pending, index, graph in pending_rewards:
+        if pending is not rewards:
+            remaining.append((pending, index, graph))
+            continue
+        full_rewards = calc_node_profit_all(graph)
+        for node, reward in full_rewards.items():
+            if rewards[node][index] is None:
+                rewards[node][index] = reward
+    pending_rewards = remaining
+    return rewards
+
+
+"""Function that calculates the reward of every node, regardless of the tracked nodes.
+
+:param graph: The graph object.
+:returns: Dictionary mapping every node to its reward.
+"""
+def calc_node_profit_all(graph):
+    global tracked_nodes
+    tracked, tracked_nodes = tracked_nodes, None
+    try:
+        rewards = calc_node_profit(graph, init_reward_list(graph))
+    finally:
+        tracked_nodes = tracked
+    return {node: reward[0] for node, reward in rewards.items()}
+
+
 """Function creates a plot of the node id's that are present in the node_list.
 
 :param rewards: The reward dictionary.
@@ -291,10 +525,30 @@ def convert_json_to_graph(data_path, data_filename, tx_amts):
 
 
 """Function that calculates the edge betweenness scores of a graph.
+The shortest paths are counted instead of enumerated: per source one Dijkstra counts the shortest paths to every node, 
+after which the share of the paths that use every edge is accumulated from the furthest nodes back to the source.
 :param graph: The graph to compute the scores on.
 :returns: edge betweenness dictionary.
 """
 def edge_betweenness_centrality(graph):
+    edge_betweenness_dict = {}
+    for edge in graph.edges():
+        edge_betweenness_dict[edge] = 0
+
+    adjacency = betweenness.grouped_adjacency(graph)
+    for src_node in graph.nodes():
+        edge_dependency, _, _ = betweenness.source_dependencies(graph, src_node, adjacency)
+        for edge, dependency in edge_dependency.items():
+            edge_betweenness_dict[edge] += dependency
+    return edge_betweenness_dict
+
+
+"""Function that calculates the edge betweenness scores of a graph by enumerating every shortest path between every 
+pair of nodes. It is kept as the reference for edge_betweenness_centrality, see scripts/betweenness_parity.py.
+:param graph: The graph to compute the scores on.
+:returns: edge betweenness dictionary.
+"""
+def edge_betweenness_centrality_enumerated(graph):
     nodes = graph.nodes()
     edges = graph.edges()
     edge_betweenness_dict = {}
@@ -374,8 +628,7 @@ def is_not_connected(g, chosen, node_id):
     res = True
 
     for node in chosen:
-        for (src, dst) in g.out_edges([node]):
-            if dst is node_id:
-                print("%s -> %s exists, failing connectivity check." % (node, node_id))
-                res = False
+        if g.has_edge(node, node_id):
+            print("%s -> %s exists, failing connectivity check." % (node, node_id))
+            res = False
     return res
@@ -0,0 +1,46 @@
+import os
+import time
+import networkx as nx
+import scripts
+
+data_path = 'data/'
+# Graphs with more nodes are skipped, None checks every graph. The enumerator takes hours on the lnjson graphs.
+max_nodes = None
+# Largest relative difference between the two implementations that is still seen as equal
+tolerance = 1e-9
+
+if __name__ == '__main__':
+    graph_files = []
+    for directory, _, file_names in os.walk(data_path):
+        graph_files.extend(os.path.join(directory, file_name) for file_name in sorted(file_names)
+                           if file_name.endswith(".gml"))
+
+    failures = []
+    for graph_file in sorted(graph_files):
+        g = nx.read_gml(graph_file)
+        if max_nodes is not None and len(g.nodes()) > max_nodes:
+            print("Skipping", graph_file, "with", len(g.nodes()), "nodes", flush=True)
+            continue
+
+        start = time.time()
+        counted = scripts.edge_betweenness_centrality(g)
+        counted_time = time.time() - start
+        start = time.time()
+        try:
+            enumerated = scripts.edge_betweenness_centrality_enumerated(g)
+        except nx.NetworkXNoPath:
+            print("Skipping", graph_file, "the enumerator needs a strongly connected graph", flush=True)
+            continue
+        enumerated_time = time.time() - start
+
+        max_difference = max((abs(counted[edge] - enumerated[edge]) / max(1.0, abs(enumerated[edge]))
+                              for edge in enumerated), default=0.0)
+        equal = counted.keys() == enumerated.keys() and max_difference <= tolerance
+        if not equal:
+            failures.append(graph_file)
+        print(graph_file, "equal:", equal, "max relative difference: %.2e" % max_difference,
+              "enumerated: %.3fs counted: %.3fs speedup: %.1fx" % (enumerated_time, counted_time,
+                                                                   enumerated_time / max(counted_time, 1e-9)),
+              flush=True)
+
+    print("Graphs that differ:", failures, flush=True)
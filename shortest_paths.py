@@ -0,0 +1,167 @@
+import networkx as nx
+import heapq
+
+
+"""Class that keeps the shortest paths from a single source up to date while edges are added to the graph.
+Next to the distance of every node it stores the number of nodes on its shortest path, and a max-heap over those path
+lengths so the destination with the longest path can be obtained without scanning all nodes.
+Edges that are inserted or become cheaper only update the nodes whose distance improves. Any other change of an edge
+leaving a reached node, or an update that creates or changes a node with several equally short paths, causes the paths
+to be recomputed, so the paths are the ones nx finds. On graphs with integer fees such ties are common, and then most
+updates recompute the paths.
+Destinations with equally long paths are ordered as nx discovers them. An update can change that order, so after an
+update the paths are recomputed as well when the longest path is tied.
+
+:param graph: The graph object.
+:param source: The source node of the shortest paths.
+"""
+class IncrementalSSSP:
+
+    def __init__(self, graph, source):
+        self.source = source
+        self.rebuild(graph)
+
+    """Function that (re)computes all shortest paths from the source.
+
+    :param graph: The graph object.
+    :returns: Void.
+    """
+    def rebuild(self, graph):
+        self.graph = graph
+        # Whether the ranks are still the discovery order of a fresh Dijkstra on the graph
+        self.fresh = True
+        self.dist, paths = nx.single_source_dijkstra(graph, self.source, weight='weight')
+        self.path_length = {}
+        self.parent = {}
+        # Rank in which nx discovered the node, used to break ties between paths of equal length
+        self.rank = {}
+        self.heap = []
+
+        for node, path in paths.items():
+            self.rank[node] = len(self.rank)
+            self.path_length[node] = len(path)
+            self.parent[node] = path[-2] if len(path) > 1 else None
+            self.heap.append((-len(path), self.rank[node], node))
+        heapq.heapify(self.heap)
+
+    """Function that updates the shortest paths after the edge node1 -> node2 has been added or changed in the graph.
+
+    :param graph: The graph object, already containing the edge.
+    :param node1: The source of the edge.
+    :param node2: The destination of the edge.
+    :param old_weight: The weight of the edge before the change, None if the edge did not exist.
+    :returns: Void.
+    """
+    def update_edge(self, graph, node1, node2, old_weight=None):
+        weight = graph[node1][node2]['weight']
+        if node1 not in self.dist:
+            return
+        if old_weight is not None and weight > old_weight:
+            self.rebuild(graph)
+            return
+        # Even an edge that is not on a shortest path can change the order in which nx discovers the nodes
+        self.graph = graph
+        self.fresh = False
+
+        new_dist = self.dist[node1] + weight
+        if node2 in self.dist and new_dist > self.dist[node2]:
+            return
+        if node2 in self.dist and new_dist == self.dist[node2]:
+            if self.parent[node2] != node1 and self.has_tie(graph, node2):
+                self.rebuild(graph)
+            return
+
+        # Dijkstra limited to the nodes whose distance improves. Nodes reached at an equal distance are kept, as
+        # their new path might be the one a fresh Dijkstra picks.
+        touched = {node2}
+        self.set_node(node2, new_dist, node1)
+        queue = [(new_dist, self.rank[node2], node2)]
+        while len(queue) > 0:
+            node_dist, _, node = heapq.heappop(queue)
+            if node_dist > self.dist[node]:
+                continue
+            for succ, edge_data in graph.succ[node].items():
+                succ_dist = node_dist + edge_data['weight']
+                if succ not in self.dist or succ_dist < self.dist[succ]:
+                    self.set_node(succ, succ_dist, node)
+                    heapq.heappush(queue, (succ_dist, self.rank[succ], succ))
+                    touched.add(succ)
+                elif succ_dist == self.dist[succ]:
+                    touched.add(succ)
+
+        # Among equally short paths nx keeps the path that was found first, which depends on the order of the whole
+        # run. The updated paths are only used when every changed node has a single shortest path predecessor.
+        if any(self.has_tie(graph, node) for node in touched):
+            self.rebuild(graph)
+
+    """Function that checks whether a node can be reached over more than one shortest path predecessor.
+
+    :param graph: The graph object.
+    :param node: The node to check.
+    :returns: Boolean whether multiple predecessors are on a shortest path to the node.
+    """
+    def has_tie(self, graph, node):
+        tight = 0
+        for pred, edge_data in graph.pred[node].items():
+            if pred in self.dist and self.dist[pred] + edge_data['weight'] == self.dist[node]:
+                tight += 1
+        return tight > 1
+
+    """Function that stores an improved shortest path of a node.
+
+    :param node: The node that obtained a shorter path.
+    :param node_dist: The new distance from the source.
+    :param parent: The node preceding node on the new path.
+    :returns: Void.
+    """
+    def set_node(self, node, node_dist, parent):
+        if node not in self.rank:
+            self.rank[node] = len(self.rank)
+        self.dist[node] = node_dist
+        self.parent[node] = parent
+        self.path_length[node] = self.path_length[parent] + 1
+        heapq.heappush(self.heap, (-self.path_length[node], self.rank[node], node))
+
+    """Function that returns the destination with the longest shortest path (in number of nodes).
+
+    :param min_length: Destinations need a path of more than min_length nodes.
+    :returns: The destination ID, or -1 if there is no destination with a long enough path.
+    """
+    def longest_path_destination(self, min_length=2):
+        self.discard_outdated()
+        if not self.fresh and len(self.heap) > 0:
+            # Check for a second destination with a path of the same length, the duplicates of the top are dropped
+            top = heapq.heappop(self.heap)
+            self.discard_outdated()
+            while len(self.heap) > 0 and self.heap[0][2] == top[2]:
+                heapq.heappop(self.heap)
+                self.discard_outdated()
+            is_tied = len(self.heap) > 0 and self.heap[0][0] == top[0]
+            heapq.heappush(self.heap, top)
+            if is_tied:
+                self.rebuild(self.graph)
+
+        if len(self.heap) > 0 and -self.heap[0][0] > min_length:
+            return self.heap[0][2]
+        return -1
+
+    """Function that discards the entries at the top of the heap of path lengths that have changed since they were
+    pushed.
+
+    :returns: Void.
+    """
+    def discard_outdated(self):
+        while len(self.heap) > 0 and -self.heap[0][0] != self.path_length[self.heap[0][2]]:
+            heapq.heappop(self.heap)
+
+    """Function that returns the shortest path from the source to a node.
+
+    :param node: The destination.
+    :returns: The path as a list of node ID's.
+    """
+    def path(self, node):
+        path = [node]
+        while self.parent[path[-1]] is not None:
+            path.append(self.parent[path[-1]])
+        path.reverse()
+        return path
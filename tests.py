@@ -1,8 +1,20 @@
 import unittest
+import copy
+import tempfile
 import networkx as nx
+import numpy as np
 import scripts
 import fee_strategies
 import placement_strategies
+import shortest_paths
+import graph_state
+import persistent_graph
+import executor
+import evaluation_cache
+import betweenness
+import edge_pruning
+import landmarks
+import contraction_hierarchy
 
 node_placement_amt = 2
 extra_party_amount = 1
@@ -64,6 +76,197 @@ class Testing(unittest.TestCase):
         self.assertEqual(len(rewards['0']), 1)
         self.assertEqual(rewards['0'][0], 39881.5)
 
+    def test_script_calc_node_profit_incremental(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        engine = betweenness.IncrementalBetweenness(g)
+        rewards = scripts.calc_node_profit(g, scripts.init_reward_list(g), engine)
+        self.assertEqual(rewards['0'][0], 39881.5)
+
+        g, new_node = scripts.add_node(g)
+        scripts.add_edge(g, new_node, '3', 500, False)
+        scripts.add_edge(g, '3', new_node, 500, False)
+        engine.update(g)
+        scripts.add_edge(g, '0', '3', 2 * scripts.get_edge(g, '0', '3')[2]['weight'], False)
+        rewards = scripts.init_reward_list(g)
+        expected = scripts.calc_node_profit(g, scripts.init_reward_list(g))
+        recomputed = engine.update(g)
+        self.assertGreater(recomputed, 0)
+        self.assertLess(recomputed, len(g.nodes()))
+        self.assertEqual(engine.edge_betweenness(),
+                         nx.edge_betweenness_centrality(g, normalized=False, weight='weight'))
+        self.assertEqual(engine.node_betweenness(), nx.betweenness_centrality(g, normalized=False, weight='weight'))
+        rewards = scripts.calc_node_profit(g, rewards, engine)
+        for node in g.nodes():
+            self.assertAlmostEqual(rewards[node][0], expected[node][0])
+
+    def test_script_grouped_dijkstra(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        # Fees of 0 add nodes to the group that is being processed
+        scripts.add_edge(g, '0', '1', 0, False)
+        scripts.add_edge(g, '3', '0', 0, False)
+        adjacency = betweenness.grouped_adjacency(g)
+        for src_node in g.nodes():
+            stack, preds, sigma, dist = betweenness.dijkstra_path_basic(g, src_node)
+            self.assertEqual(betweenness.grouped_dijkstra_path_basic(adjacency, src_node), (stack, preds, sigma, dist))
+            nx_preds, nx_dist = nx.dijkstra_predecessor_and_distance(g, src_node, weight='weight')
+            self.assertEqual(dist, nx_dist)
+            self.assertEqual({node: sorted(preds[node]) for node in dist},
+                             {node: sorted(nx_preds[node]) for node in dist})
+        self.assertEqual(scripts.edge_betweenness_centrality(g), nx.edge_betweenness_centrality(g, normalized=False,
+                                                                                                weight='weight'))
+
+        # Fractional fees are grouped by the same sums networkx compares
+        g = nx.read_gml("data/lnjson/graph100_init.gml")
+        adjacency = betweenness.grouped_adjacency(g)
+        self.assertIsNotNone(adjacency)
+        for src_node in list(g.nodes())[0:50]:
+            self.assertEqual(betweenness.grouped_dijkstra_path_basic(adjacency, src_node),
+                             betweenness.dijkstra_path_basic(g, src_node))
+        scripts.add_edge(g, '0', '1', -1, False)
+        self.assertIsNone(betweenness.grouped_adjacency(g))
+
+    def test_script_calc_node_profit_blocks(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        # A leaf hanging off a leaf, and two leaves on the core
+        g, leaf = scripts.add_node(g)
+        scripts.add_edge(g, '3', leaf, 700, False)
+        scripts.add_edge(g, leaf, '3', 900, False)
+        for attachment in [leaf, '12']:
+            g, new_node = scripts.add_node(g)
+            scripts.add_edge(g, attachment, new_node, 300, False)
+            scripts.add_edge(g, new_node, attachment, 400, False)
+        blocks, multiplicities = betweenness.block_multiplicities(g)
+        self.assertEqual(len(blocks), 4)
+        for block, multiplicity in zip(blocks, multiplicities):
+            if len(block) > 2:
+                self.assertEqual(multiplicity['3'], 3)
+
+        betweenness.block_decomposition = False
+        try:
+            expected = scripts.calc_node_profit(g, scripts.init_reward_list(g))
+            expected_rew = fee_strategies.compute_node_rew(500, g, ('12', '0'))
+        finally:
+            betweenness.block_decomposition = True
+        rewards = scripts.calc_node_profit(g, scripts.init_reward_list(g))
+        for node in g.nodes():
+            self.assertAlmostEqual(rewards[node][0], expected[node][0])
+        edge_rew, rest_rew = fee_strategies.compute_node_rew(500, g, ('12', '0'))
+        self.assertAlmostEqual(edge_rew, expected_rew[0])
+        self.assertAlmostEqual(rest_rew, expected_rew[1])
+
+    def test_script_calc_node_profit_attribution(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        scripts.set_attribution(True)
+        try:
+            rewards = scripts.calc_node_profit(g, scripts.init_reward_list(g))
+        finally:
+            scripts.set_attribution(False)
+        self.assertEqual(rewards['0'][0], 39881.5)
+        self.assertEqual(len(scripts.attributions), 1)
+
+        with tempfile.TemporaryDirectory() as directory:
+            scripts.save_attributions(directory + "/attribution.npz")
+            attribution = np.load(directory + "/attribution.npz")
+            self.assertFalse(np.any(attribution["source"] == attribution["owner"]))
+            for node in g.nodes():
+                self.assertAlmostEqual(float(np.sum(attribution["amount"][attribution["owner"] == node])),
+                                       rewards[node][0])
+
+    def test_script_calc_node_profit_parallel(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        expected = scripts.calc_node_profit(g, scripts.init_reward_list(g))
+        betweenness.block_decomposition = False
+        try:
+            expected_single_block = scripts.calc_node_profit(g, scripts.init_reward_list(g))
+        finally:
+            betweenness.block_decomposition = True
+
+        executor.set_worker_count(2)
+        try:
+            rewards = scripts.calc_node_profit(g, scripts.init_reward_list(g), parallel=True)
+            betweenness.block_decomposition = False
+            try:
+                rewards_single_block = scripts.calc_node_profit(g, scripts.init_reward_list(g), parallel=True)
+            finally:
+                betweenness.block_decomposition = True
+
+            # The attribution is only recorded serially
+            scripts.set_attribution(True)
+            try:
+                rewards_attribution = scripts.calc_node_profit(g, scripts.init_reward_list(g), parallel=True)
+                self.assertEqual(len(scripts.attributions), 1)
+            finally:
+                scripts.set_attribution(False)
+        finally:
+            executor.set_worker_count(None)
+        self.assertEqual(rewards, expected)
+        self.assertEqual(rewards_single_block, expected_single_block)
+        for node in g.nodes():
+            self.assertAlmostEqual(rewards_attribution[node][0], expected[node][0])
+
+    def test_script_calc_node_profit_zero_fees(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        # Fees of 0, 1, 2 and 3, without cycles of fee 0
+        for index, (src, dst) in enumerate(list(g.edges())):
+            fee = index % 4
+            if fee == 0 and int(src) > int(dst):
+                fee = 2
+            scripts.add_edge(g, src, dst, fee, False)
+
+        betweenness.block_decomposition = False
+        try:
+            expected = scripts.calc_node_profit(g, scripts.init_reward_list(g))
+            expected_rew = fee_strategies.compute_node_rew(0, g, ('12', '0'))
+        finally:
+            betweenness.block_decomposition = True
+        rewards = scripts.calc_node_profit(g, scripts.init_reward_list(g))
+        parallel_rewards = scripts.calc_node_profit(g, scripts.init_reward_list(g), parallel=True)
+        for node in g.nodes():
+            self.assertAlmostEqual(rewards[node][0], expected[node][0])
+            self.assertAlmostEqual(parallel_rewards[node][0], expected[node][0])
+
+        bounds = landmarks.LandmarkBounds(g, [('12', '0')], 4, first_landmark='12')
+        for edge_rew, rest_rew in [fee_strategies.compute_node_rew(0, g, ('12', '0')),
+                                   fee_strategies.compute_node_rew(0, g, ('12', '0'), bounds)]:
+            self.assertAlmostEqual(edge_rew, expected_rew[0])
+            self.assertAlmostEqual(rest_rew, expected_rew[1])
+
+    def test_script_calc_node_profit_tracked(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        our_party_id = list(g.nodes())[-1]
+        expected = scripts.calc_node_profit(g, scripts.init_reward_list(g))
+
+        scripts.set_tracked_nodes(['0', our_party_id])
+        try:
+            rewards = scripts.calc_node_profit(g, scripts.init_reward_list(g))
+        finally:
+            scripts.set_tracked_nodes(None)
+        self.assertAlmostEqual(rewards['0'][0], 39881.5)
+        self.assertAlmostEqual(rewards[our_party_id][0], expected[our_party_id][0])
+        self.assertIsNone(rewards['1'][0])
+
+        rewards = scripts.fill_rewards(rewards)
+        for node in g.nodes():
+            self.assertAlmostEqual(rewards[node][0], expected[node][0])
+        self.assertEqual(len(scripts.pending_rewards), 0)
+
+    def test_script_calc_node_profit_tracked_float_fees(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        # Fees like those of the lnjson graphs, whose sums depend on the order of the additions
+        fees = [0.1, 0.2, 0.3, 0.7, 1000.1, 0]
+        for index, (src, dst) in enumerate(list(g.edges())):
+            scripts.add_edge(g, src, dst, fees[index % len(fees)], False)
+        expected = scripts.calc_node_profit(g, scripts.init_reward_list(g))
+
+        scripts.set_tracked_nodes(['0', '1', '2'])
+        try:
+            rewards = scripts.calc_node_profit(g, scripts.init_reward_list(g))
+        finally:
+            scripts.set_tracked_nodes(None)
+        for node in g.nodes():
+            self.assertAlmostEqual(rewards[node][0], expected[node][0])
+        self.assertEqual(len(scripts.pending_rewards), 0)
+
     def test_script_edge_betweenness_centrality(self):
         g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
 
@@ -71,6 +274,11 @@ class Testing(unittest.TestCase):
         self.assertEqual(len(edge_betweenness_dict), 154)
         self.assertEqual(edge_betweenness_dict[('0', '7')], 3.0)
 
+        enumerated_dict = scripts.edge_betweenness_centrality_enumerated(g)
+        self.assertEqual(list(edge_betweenness_dict.keys()), list(enumerated_dict.keys()))
+        for edge in enumerated_dict:
+            self.assertAlmostEqual(edge_betweenness_dict[edge], enumerated_dict[edge])
+
     def test_script_initial_connection_base(self):
         g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
         placement_strategies.set_most_freq_fee(100)
@@ -101,6 +309,71 @@ class Testing(unittest.TestCase):
         isNotConnected = scripts.is_not_connected(g, ['1'], new_node)
         self.assertFalse(isNotConnected)
 
+    def test_graph_state_index(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        our_party_id = list(g.nodes())[-1]
+        state = graph_state.get_state(g)
+        self.assertEqual(state.candidates(our_party_id),
+                         placement_strategies.remove_connected_nodes(g.nodes(), g.edges(), our_party_id))
+
+        g = scripts.add_edge(g, our_party_id, '5', 1000, False)
+        g = scripts.remove_edge(g, '2', '0')
+        g, new_node_id = scripts.add_node(g)
+        self.assertIs(graph_state.get_state(g), state)
+        self.assertEqual(new_node_id, '21')
+        self.assertTrue(state.is_connected('5', our_party_id))
+        self.assertFalse(state.is_connected('2', '0'))
+        self.assertEqual(state.candidates(our_party_id),
+                         placement_strategies.remove_connected_nodes(g.nodes(), g.edges(), our_party_id))
+
+        deg_list = sorted(g.degree(), key=lambda node: node[1], reverse=True)
+        expected = placement_strategies.remove_connected_nodes([tup[0] for tup in deg_list], g.edges(), our_party_id)
+        self.assertEqual(state.highest_degree_candidates(our_party_id, 5), expected[0:5])
+
+        # Adding an edge that is already indexed, such as a fee change, leaves the degrees as they are
+        g = scripts.add_edge(g, our_party_id, '5', 500, False)
+        state.add_edge(our_party_id, '5')
+        self.assertIs(graph_state.get_state(g), state)
+        self.assertEqual(state.highest_degree_candidates(our_party_id, 5), expected[0:5])
+
+        # An edge added directly on the graph changes the number of edges, so a new index is made
+        g.add_edge(our_party_id, '7', weight=1000)
+        self.assertIsNot(graph_state.get_state(g), state)
+        self.assertTrue(graph_state.get_state(g).is_connected('7', our_party_id))
+        self.assertEqual(graph_state.get_state(g).candidates(our_party_id),
+                         placement_strategies.remove_connected_nodes(g.nodes(), g.edges(), our_party_id))
+
+    def test_persistent_graph_fork(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        persistent = persistent_graph.fork(g)
+        self.assertEqual(sorted(persistent.edges(data=True)), sorted(g.edges(data=True)))
+
+        forked = persistent_graph.fork(persistent)
+        forked = scripts.add_edge(forked, '0', '1', 5, False)
+        forked = scripts.remove_edge(forked, '0', '2')
+        copied = copy.deepcopy(persistent)
+        self.assertIsInstance(copied, persistent_graph.PersistentGraph)
+        copied.add_edge('0', '1', weight=7)
+
+        # Changes to a fork are not visible in the graph it was forked from, nor in other forks
+        self.assertEqual(persistent['0']['1']['weight'], g['0']['1']['weight'])
+        self.assertTrue(persistent.has_edge('0', '2') and persistent.has_edge('2', '0'))
+        self.assertEqual(forked['0']['1']['weight'], 5)
+        self.assertFalse(forked.has_edge('0', '2') or forked.has_edge('2', '0'))
+        self.assertIs(forked.pred['1']['0'], forked.succ['0']['1'])
+        self.assertEqual(copied['0']['1']['weight'], 7)
+        self.assertEqual(nx.edge_betweenness_centrality(persistent, normalized=False, weight='weight'),
+                         nx.edge_betweenness_centrality(g, normalized=False, weight='weight'))
+
+    def test_scripts_graph_fingerprint(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        reordered = nx.DiGraph()
+        reordered.add_nodes_from(reversed(list(g.nodes())))
+        reordered.add_edges_from(reversed(list(g.edges(data=True))))
+        self.assertEqual(scripts.graph_fingerprint(g), scripts.graph_fingerprint(reordered))
+        scripts.add_edge(reordered, '0', '1', 1, False)
+        self.assertNotEqual(scripts.graph_fingerprint(g), scripts.graph_fingerprint(reordered))
+
     ######################### Tests for placement_strategies.py #########################
 
     def test_placement_strategies_set_most_freq_fee(self):
@@ -168,6 +441,20 @@ class Testing(unittest.TestCase):
         self.assertEqual(edge[0], new_node_id)
         self.assertEqual(edge[1], '6')
 
+    def test_placement_strategies_betweenness_centrality_approximate(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        placement_strategies.set_most_freq_fee(100)
+        g, new_node_id = scripts.add_node(g)
+        scripts.initial_connection(g, new_node_id, 2, True)
+
+        g = placement_strategies.betweenness_centrality(g, new_node_id, 1, False, approximate=True, delta=0.2, seed=1)
+        print(g.out_edges(new_node_id))
+        self.assertNotEqual(scripts.get_edge(g, new_node_id, '6'), -1)
+        report = placement_strategies.betweenness_report
+        self.assertTrue(report["separated"])
+        self.assertEqual(report["confidence"], 0.8)
+        self.assertLess(report["samples"], report["max_samples"])
+
     def test_placement_strategies_k_center(self):
         g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
         placement_strategies.set_most_freq_fee(100)
@@ -181,6 +468,62 @@ class Testing(unittest.TestCase):
         self.assertEqual(edge[0], new_node_id)
         self.assertEqual(edge[1], '11')
 
+    def test_placement_strategies_k_center_exhaustive(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        placement_strategies.set_most_freq_fee(100)
+        our_party_id = list(g.nodes())[-1]
+        expected_graph = copy.deepcopy(g)
+
+        # The exhaustive version: a fresh Dijkstra for every edge, ties broken by the order of its paths
+        choices = []
+        for i in range(6):
+            dist_dict = nx.single_source_dijkstra_path(expected_graph, our_party_id, weight='weight')
+            dist_dict.pop(our_party_id)
+            longest_path_length = -1
+            longest_path_destination = -1
+            for path in dist_dict.values():
+                if len(path) > longest_path_length and len(path) > 2:
+                    longest_path_length = len(path)
+                    longest_path_destination = path[-1]
+            choices.append(longest_path_destination)
+            expected_graph = placement_strategies.create_edges(expected_graph, [longest_path_destination], our_party_id,
+                                                               False)
+        self.assertEqual(choices, ['11', '1', '13', '5', '9', '2'])
+
+        g = placement_strategies.k_center(g, our_party_id, 6, False)
+        self.assertEqual(sorted(g.edges(data=True)), sorted(expected_graph.edges(data=True)))
+
+    def test_shortest_paths_incremental_sssp(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        placement_strategies.set_most_freq_fee(100)
+        our_party_id = list(g.nodes())[-1]
+        paths = shortest_paths.IncrementalSSSP(g, our_party_id)
+        self.assertEqual(paths.longest_path_destination(), '11')
+
+        g = placement_strategies.create_edges(g, ['11'], our_party_id, False)
+        paths.update_edge(g, our_party_id, '11')
+        dist, fresh_paths = nx.single_source_dijkstra(g, our_party_id, weight='weight')
+        self.assertEqual(paths.dist, dist)
+        for node in fresh_paths:
+            self.assertEqual(paths.path_length[node], len(fresh_paths[node]))
+        self.assertEqual(paths.path('11'), [our_party_id, '11'])
+
+    def test_shortest_paths_incremental_sssp_tie(self):
+        g = nx.DiGraph()
+        g.add_weighted_edges_from([('s', 'a', 1), ('a', 'b', 1), ('b', 't', 1), ('t', 'c', 1)])
+        paths = shortest_paths.IncrementalSSSP(g, 's')
+        self.assertEqual(paths.longest_path_destination(), 'c')
+
+        # The new edge is as short as the current path to t, a fresh Dijkstra finds it first
+        g.add_edge('s', 't', weight=3)
+        paths.update_edge(g, 's', 't')
+        dist, fresh_paths = nx.single_source_dijkstra(g, 's', weight='weight')
+        self.assertEqual(paths.dist, dist)
+        for node in fresh_paths:
+            self.assertEqual(paths.path(node), fresh_paths[node])
+            self.assertEqual(paths.path_length[node], len(fresh_paths[node]))
+        self.assertEqual(paths.longest_path_destination(), 'b')
+
     def test_placement_strategies_k_means(self):
         g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
         placement_strategies.set_most_freq_fee(100)
@@ -194,6 +537,25 @@ class Testing(unittest.TestCase):
         self.assertEqual(edge[0], new_node_id)
         self.assertEqual(edge[1], '20')
 
+    def test_placement_strategies_k_means_multiple(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        placement_strategies.set_most_freq_fee(100)
+        g, new_node_id = scripts.add_node(g)
+        scripts.initial_connection(g, new_node_id, 2, True)
+
+        g = placement_strategies.k_means(g, new_node_id, 3, False)
+        print(g.out_edges(new_node_id))
+        self.assertEqual(sorted(g.successors(new_node_id)), ['0', '12', '15', '20', '3'])
+
+    def test_placement_strategies_nearest_observation(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        observation_list = set(g.nodes()) - {'5'}
+
+        res = nx.multi_source_dijkstra_path_length(g, observation_list, weight='weight')
+        candid_dist, source = placement_strategies.nearest_observation(g, '5', set())
+        self.assertEqual(candid_dist, res['5'])
+        self.assertEqual(g[source]['5']['weight'], candid_dist)
+
     def test_placement_strategies_fee_weighted_centrality(self):
         g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
         placement_strategies.set_most_freq_fee(100)
@@ -207,6 +569,250 @@ class Testing(unittest.TestCase):
         self.assertEqual(edge[0], new_node_id)
         self.assertEqual(edge[1], '3')
 
+    def test_placement_strategies_lazy_fee_weighted_centrality(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        placement_strategies.set_most_freq_fee(100)
+        g, new_node_id = scripts.add_node(g)
+        scripts.initial_connection(g, new_node_id, 2, True)
+        candidate_amt = len(placement_strategies.remove_connected_nodes(g.nodes(), g.edges(), new_node_id))
+
+        g = placement_strategies.fee_weighted_centrality(g, new_node_id, 2, lazy=True)
+        print(g.out_edges(new_node_id))
+        self.assertEqual(len(g.out_edges(new_node_id)), 4)
+        self.assertNotEqual(scripts.get_edge(g, new_node_id, '3'), -1)
+
+        report = placement_strategies.lazy_greedy_report
+        self.assertEqual(report["placed"], 2)
+        self.assertEqual(report["evaluations"], candidate_amt + report["re_evaluations"])
+        self.assertLess(report["re_evaluations"], candidate_amt - 1)
+
+    def test_placement_strategies_run_reaction_jobs(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        placement_strategies.set_most_freq_fee(100)
+        our_party_id = list(g.nodes())[-1]
+        g, other_party_id = scripts.add_node(g)
+        g = placement_strategies.create_edges(g, ['0', '1'], other_party_id, False)
+        edge_candidates = [placement_strategies.fee_weighted_centrality_job(g, our_party_id, candid, 100)
+                           for candid in ['5', '9']]
+
+        executor.set_worker_count(2)
+        try:
+            parallel_res = placement_strategies.run_reaction_jobs(g, edge_candidates, {"party": [other_party_id]})
+        finally:
+            executor.set_worker_count(None)
+        serial_res = [placement_strategies.game_theory_party_job(g, *candid, [other_party_id])
+                      for candid in edge_candidates]
+        self.assertEqual(parallel_res, serial_res)
+
+    def test_placement_strategies_game_theory_beam(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        placement_strategies.set_most_freq_fee(100)
+        our_party_id = list(g.nodes())[-1]
+        g, other_party_id = scripts.add_node(g)
+        g = placement_strategies.create_edges(g, ['0', '1'], other_party_id, False)
+
+        g, chosen_candid = placement_strategies.game_theory(g, our_party_id, 1, {"party": [other_party_id]}, beam=True,
+                                                            beam_width=2)
+        report = placement_strategies.beam_report
+        self.assertEqual(report["evaluated"], 2)
+        # The reaction of the other party raises the reward of the second candidate above its bound
+        self.assertEqual(report["stopped_by"], "beam_width")
+        self.assertEqual([check[2] for check in report["bound_check"]], [True, False])
+        self.assertEqual(chosen_candid[5], max(check[1] for check in report["bound_check"]))
+        self.assertNotEqual(scripts.get_edge(g, our_party_id, chosen_candid[1]), -1)
+
+    def test_placement_strategies_game_theory_lookahead(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        placement_strategies.set_most_freq_fee(100)
+        our_party_id = list(g.nodes())[-1]
+        g, other_party_id = scripts.add_node(g)
+        g = placement_strategies.create_edges(g, ['0', '1'], other_party_id, False)
+        calculation_graph = copy.deepcopy(g)
+        start_graph = copy.deepcopy(g)
+
+        transposition_table = {}
+        g, chosen_candid = placement_strategies.game_theory_lookahead(g, our_party_id, 1, {"party": [other_party_id]},
+                                                                      depth=1, width=1,
+                                                                      transposition_table=transposition_table)
+        self.assertEqual(chosen_candid[1], other_party_id)
+        self.assertNotEqual(scripts.get_edge(g, our_party_id, other_party_id), -1)
+        party_res = placement_strategies.game_theory_party_job(calculation_graph, *chosen_candid[0:4], [other_party_id])
+        self.assertEqual(chosen_candid[5], party_res[5])
+
+        # The same graph is found in the transposition table
+        placement_strategies.game_theory_lookahead(calculation_graph, our_party_id, 1, {"party": [other_party_id]},
+                                                   depth=1, width=1, transposition_table=transposition_table)
+        self.assertEqual(placement_strategies.lookahead_report["table_hits"], 1)
+        self.assertEqual(placement_strategies.lookahead_report["searched"], 0)
+
+        # A wider search is not answered by the entries of the narrower one
+        _, wide_candid = placement_strategies.game_theory_lookahead(copy.deepcopy(start_graph), our_party_id, 1,
+                                                                    {"party": [other_party_id]}, depth=1, width=3,
+                                                                    transposition_table=transposition_table)
+        self.assertEqual(placement_strategies.lookahead_report["table_hits"], 0)
+        self.assertEqual(wide_candid[1], '3')
+        self.assertGreater(placement_strategies.lookahead_report["pruned"], 0)
+
+        # Pruned results are lower bounds, a search without pruning does not reuse them
+        _, exact_candid = placement_strategies.game_theory_lookahead(copy.deepcopy(start_graph), our_party_id, 1,
+                                                                     {"party": [other_party_id]}, depth=1, width=3,
+                                                                     bound_factor=None,
+                                                                     transposition_table=transposition_table)
+        self.assertEqual(placement_strategies.lookahead_report["pruned"], 0)
+        self.assertGreaterEqual(exact_candid[5], wide_candid[5])
+        bounded = [entry[2] for key, entry in transposition_table.items() if key[1:3] == (1, 3)]
+        self.assertEqual(sorted(bounded), [False, True])
+
+        # Results for another most frequent fee are not taken from the table
+        placement_strategies.set_most_freq_fee(10000)
+        placement_strategies.game_theory_lookahead(copy.deepcopy(start_graph), our_party_id, 1,
+                                                   {"party": [other_party_id]}, depth=1, width=1,
+                                                   transposition_table=transposition_table)
+        placement_strategies.set_most_freq_fee(100)
+        self.assertEqual(placement_strategies.lookahead_report["table_hits"], 0)
+        self.assertGreater(placement_strategies.lookahead_report["searched"], 0)
+
+    def test_placement_strategies_simultaneous_best_responses(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario4/" + "small-graph" + str(tx_amts[0]) + "_1_party_init" + ".gml")
+        placement_strategies.set_most_freq_fee(100)
+        party_ids = list(g.nodes())[-2:]
+
+        g, choices = placement_strategies.simultaneous_best_responses(g, party_ids)
+        for party_id in party_ids:
+            self.assertEqual(choices[party_id][1], '3')
+            self.assertEqual(scripts.get_edge(g, party_id, '3')[2]['weight'], choices[party_id][2])
+        self.assertEqual(placement_strategies.simultaneous_report["iterations"], 1)
+
+        # Both parties want to connect to each other, only the first one gets that channel
+        rankings = [[(party_ids[0], party_ids[1], 10, 5.0), (party_ids[0], '3', 10, 4.0)],
+                    [(party_ids[1], party_ids[0], 10, 6.0), (party_ids[1], '5', 10, 2.0)]]
+        choices, conflicts = placement_strategies.resolve_conflicts(party_ids, rankings)
+        self.assertEqual(conflicts, 1)
+        self.assertEqual(choices[party_ids[0]][1], party_ids[1])
+        self.assertEqual(choices[party_ids[1]][1], '5')
+
+        # The rewards of a stable choice can differ in the last bits between rounds
+        noisy_choices = {party_id: candid[0:3] + (candid[3] + 1e-12,) for party_id, candid in choices.items()}
+        self.assertTrue(placement_strategies.same_choices(choices, noisy_choices))
+        noisy_choices[party_ids[1]] = (party_ids[1], '3', 10, 4.0)
+        self.assertFalse(placement_strategies.same_choices(choices, noisy_choices))
+
+    def test_placement_strategies_speculate_next_round(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        placement_strategies.set_most_freq_fee(100)
+        our_party_id = list(g.nodes())[-1]
+        expected = placement_strategies.fee_weighted_centrality(copy.deepcopy(g), our_party_id, 2)
+
+        executor.set_worker_count(2)
+        placement_strategies.set_speculation(2)
+        try:
+            g = placement_strategies.fee_weighted_centrality(g, our_party_id, 1)
+            self.assertEqual(len(placement_strategies.speculations), 2)
+            hits = placement_strategies.speculation_report["hits"]
+            # Other parallel work cancels the speculative tasks that did not start, they are evaluated again
+            scripts.calc_node_profit(g, scripts.init_reward_list(g), parallel=True)
+            self.assertEqual(executor.speculative_futures, [])
+            g = placement_strategies.fee_weighted_centrality(g, our_party_id, 1)
+        finally:
+            placement_strategies.set_speculation(0)
+            executor.set_worker_count(None)
+        self.assertEqual(placement_strategies.speculation_report["hits"], hits + 1)
+        self.assertEqual(sorted(g.edges(data=True)), sorted(expected.edges(data=True)))
+
+    def test_evaluation_cache(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        placement_strategies.set_most_freq_fee(100)
+        our_party_id = list(g.nodes())[-1]
+        expected = placement_strategies.evaluate_edge_candidates(g, our_party_id, ['5', '9', '12'])
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            evaluation_cache.set_cache(cache_dir + "/evaluations.sqlite", 3)
+            try:
+                hits = evaluation_cache.cache_report["hits"]
+                placement_strategies.evaluate_edge_candidates(g, our_party_id, ['5', '9'])
+                res = placement_strategies.evaluate_edge_candidates(g, our_party_id, ['5', '9', '12'])
+                self.assertEqual(res, expected)
+                self.assertEqual(evaluation_cache.cache_report["hits"], hits + 2)
+
+                # Another fee amount is another evaluation, the least recently used one is evicted
+                placement_strategies.set_most_freq_fee(10000)
+                placement_strategies.evaluate_edge_candidates(g, our_party_id, ['5'])
+                with evaluation_cache.connect() as connection:
+                    self.assertEqual(connection.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0], 3)
+
+                # The defaults of the fee strategies and the source of the code are part of the key as well
+                key = evaluation_cache.evaluation_key("kind", "fingerprint", "item", ())
+                fee_strategies.prune_edges = False
+                self.assertNotEqual(evaluation_cache.evaluation_key("kind", "fingerprint", "item", ()), key)
+                fee_strategies.prune_edges = True
+                evaluation_cache.code_version = "other"
+                self.assertNotEqual(evaluation_cache.evaluation_key("kind", "fingerprint", "item", ()), key)
+                evaluation_cache.code_version = None
+                self.assertEqual(evaluation_cache.evaluation_key("kind", "fingerprint", "item", ()), key)
+            finally:
+                evaluation_cache.set_cache(None)
+                placement_strategies.set_most_freq_fee(100)
+                fee_strategies.prune_edges = True
+                evaluation_cache.code_version = None
+
+    def test_placement_strategies_channel_value_matrix(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        placement_strategies.set_most_freq_fee(100)
+        sources = ['0', '12', '20']
+        values, value_sources, nodes = placement_strategies.channel_value_matrix(g, sources)
+        self.assertEqual(value_sources, sources)
+        self.assertEqual(values.shape, (3, g.number_of_nodes()))
+
+        for row, src_node in enumerate(sources):
+            candidates = graph_state.get_state(g).candidates(src_node)
+            current_reward = placement_strategies.node_reward(g, src_node)
+            for column, node in enumerate(nodes):
+                if node not in candidates:
+                    self.assertTrue(np.isnan(values[row, column]))
+                elif column % 5 == 0:
+                    # Change of the reward of the source when the new edge is actually placed, the traffic it takes
+                    # from the other edges of the source included
+                    edge_rew, rest_rew = fee_strategies.compute_node_rew(1000, g, (src_node, node))
+                    self.assertAlmostEqual(values[row, column], edge_rew + rest_rew - current_reward)
+
+    def test_placement_strategies_fee_uncertainty(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        placement_strategies.set_most_freq_fee(100)
+        our_party_id = list(g.nodes())[-1]
+
+        # Without noise every sample equals the estimate of channel_value_matrix, the fee is not rounded
+        for src_node in [our_party_id, '0']:
+            res = placement_strategies.fee_uncertainty(g, src_node, samples=2, noise=0.0, fee=100.4)
+            values, _, nodes = placement_strategies.channel_value_matrix(g, [src_node], fee=100.4)
+            expected = values[0, [nodes.index(node) for node in res["candidates"]]]
+            self.assertTrue(np.allclose(res["rewards"], expected[None, :]))
+            self.assertGreater(np.max(np.abs(expected)), 0)
+
+        res = placement_strategies.fee_uncertainty(g, our_party_id, samples=50, noise=0.2, seed=3, fee=100)
+        self.assertEqual(res["rewards"].shape, (50, len(res["candidates"])))
+        self.assertAlmostEqual(np.sum(res["p_best"]), 1.0)
+        self.assertGreater(np.max(res["std"]), 0)
+        same_res = placement_strategies.fee_uncertainty(g, our_party_id, samples=50, noise=0.2, seed=3, fee=100)
+        self.assertTrue(np.array_equal(res["rewards"], same_res["rewards"]))
+
+    def test_placement_strategies_reaction_edges(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        placement_strategies.set_most_freq_fee(100)
+        our_party_id = list(g.nodes())[-1]
+        base_betweenness = nx.edge_betweenness_centrality(g, normalized=False, weight='weight')
+        candid_graph = placement_strategies.reaction_graph(g, our_party_id, '9', 1000)
+
+        nearby_edges = placement_strategies.reaction_edges(candid_graph, our_party_id, '9', 0)
+        for edge in nearby_edges:
+            self.assertTrue(edge[0] in [our_party_id, '9'] or edge[1] in [our_party_id, '9'])
+        self.assertIn((our_party_id, '9'), [(edge[0], edge[1]) for edge in nearby_edges])
+
+        changed_edges = placement_strategies.reaction_edges(candid_graph, our_party_id, '9', 0, base_betweenness)
+        self.assertGreater(len(changed_edges), len(nearby_edges))
+        self.assertLess(len(changed_edges), candid_graph.number_of_edges())
+        all_edges = placement_strategies.reaction_edges(candid_graph, our_party_id, '9', candid_graph.number_of_nodes())
+        self.assertEqual(len(all_edges), candid_graph.number_of_edges())
+
     ######################### Tests for fee_strategies.py #########################
 
     def test_fee_strategies_graph_fee_optimization(self):
@@ -216,6 +822,73 @@ class Testing(unittest.TestCase):
         g = fee_strategies.graph_fee_optimization(g)
         self.assertEqual(scripts.get_edge(g, '0', '1')[2]['weight'], 563)
 
+    def test_edge_pruning_edge_pruner(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        pruner = edge_pruning.EdgePruner(g)
+        self.assertGreater(pruner.report["fraction"], 0)
+        between_cent = nx.edge_betweenness_centrality(g, normalized=False, weight='weight')
+        routing_between_cent = nx.edge_betweenness_centrality(pruner.routing_graph(g), normalized=False,
+                                                              weight='weight')
+        for edge in g.edges():
+            self.assertAlmostEqual(between_cent[edge], routing_between_cent.get(edge, 0.0))
+
+        # Kept edges are never pruned nor used as a witness
+        pruned_edge, (_, witness) = next(iter(pruner.witnesses.items()))
+        kept_pruner = edge_pruning.EdgePruner(g, [pruned_edge, witness[0]])
+        self.assertNotIn(pruned_edge, kept_pruner.witnesses)
+        for _, kept_witness in kept_pruner.witnesses.values():
+            self.assertNotIn(witness[0], kept_witness)
+        self.assertNotIn(pruned_edge, pruner.pruned_edges([witness[0]]))
+
+        # Making the witness more expensive invalidates the certificate
+        scripts.add_edge(g, witness[0][0], witness[0][1], 100000, False)
+        pruner.update(g)
+        self.assertGreater(pruner.report["invalidated"], 0)
+        self.assertTrue(pruned_edge not in pruner.witnesses or pruner.witnesses[pruned_edge][1] != witness)
+
+    def test_landmarks_landmark_bounds(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")
+        bounds = landmarks.LandmarkBounds(g, [('0', '1')], 4, first_landmark='0')
+        self.assertEqual(len(bounds.landmarks), 4)
+        for fee in [1, 563, 5000]:
+            g = scripts.add_edge(g, '0', '1', fee, False)
+            between_cent = bounds.reroute_edge_betweenness(g, '0', fee)
+            expected = betweenness.reroute_edge_betweenness(g, ['0'])
+            for edge, value in between_cent.items():
+                self.assertAlmostEqual(value, expected[edge])
+        self.assertGreater(bounds.report["skipped_pairs"], 0)
+
+        # The bounds are only used when the contraction hierarchy is not
+        contraction_hierarchy.use_hierarchy = False
+        try:
+            edge_rew, rest_rew = fee_strategies.compute_node_rew(563, g, ('0', '1'), bounds)
+            expected_rew = fee_strategies.compute_node_rew(563, g, ('0', '1'))
+        finally:
+            contraction_hierarchy.use_hierarchy = True
+        self.assertAlmostEqual(edge_rew, expected_rew[0])
+        self.assertAlmostEqual(rest_rew, expected_rew[1])
+
+    def test_contraction_hierarchy_all_pairs(self):
+        g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "medium-graph" + str(tx_amts[1]) + "_init" + ".gml")
+        nodes = list(g.nodes())
+        for fee in [1, 563, 5000]:
+            g = scripts.add_edge(g, '0', '1', fee, False)
+            dist_matrix, sigma_matrix = contraction_hierarchy.all_pairs_distances_and_counts(g, nodes)
+            expected_dist, expected_sigma = betweenness.all_pairs_distances_and_counts(g, nodes)
+            np.testing.assert_array_equal(dist_matrix, expected_dist)
+            np.testing.assert_array_equal(sigma_matrix, expected_sigma)
+        # The fees changed, the topology did not
+        self.assertIs(contraction_hierarchy.get_hierarchy(g), contraction_hierarchy.get_hierarchy(nx.DiGraph(g)))
+
+        edge_rew, rest_rew = fee_strategies.compute_node_rew(563, g, ('0', '1'))
+        contraction_hierarchy.use_hierarchy = False
+        try:
+            expected_rew = fee_strategies.compute_node_rew(563, g, ('0', '1'))
+        finally:
+            contraction_hierarchy.use_hierarchy = True
+        self.assertAlmostEqual(edge_rew, expected_rew[0])
+        self.assertAlmostEqual(rest_rew, expected_rew[1])
+
     def test_fee_strategies_edge_fee_optimization(self):
         g = nx.read_gml(
 data_path + "randomness_graphs/scenario2/" + "medium-graph" + str(tx_amts[2]) + "_init" + ".gml")
@@ -230,6 +903,8 @@ data_path + "randomness_graphs/scenario2/" + "medium-graph" + str(tx_amts[2]) +
         g = fee_strategies.edge_fee_optimization(g, edge)
         edge_after_optimization = scripts.get_edge(g, our_party_id, '0')
         self.assertEqual(edge[2]['weight'], edge_after_optimization[2]['weight'])
+        # All fee probes are answered by the contraction hierarchy, the landmark bounds are not computed
+        self.assertIsNone(fee_strategies.landmark_global)
 
     def test_fee_strategies_compute_node_rew(self):
         g = nx.read_gml(data_path + "randomness_graphs/scenario2/" + "small-graph" + str(tx_amts[0]) + "_init" + ".gml")